@@ -0,0 +1,151 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from newsletter import gmail_client
+from newsletter.gmail_client import GmailClient
+
+
+def _http_error(status: int, content: bytes = b"{}") -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service, self.callback, self.ids = service, callback, []
+
+    def add(self, request, request_id):
+        self.ids.append(request_id)
+
+    def execute(self, http=None):
+        self.service.batches.append(list(self.ids))
+        for msg_id in self.ids:
+            outcome = self.service.outcomes.get(msg_id, [])
+            exception = outcome.pop(0) if outcome else None
+            response = None if exception else {"id": msg_id, "payload": {"headers": [
+                {"name": "Message-ID", "value": f"<{msg_id}@x>"},
+            ]}}
+            self.callback(msg_id, response, exception)
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeService:
+    """Just enough of the Gmail service for batched gets and history listing."""
+
+    def __init__(self, outcomes=None, history=None):
+        # msg_id -> exceptions its next sub-requests fail with, in order
+        self.outcomes = outcomes or {}
+        self.history_pages = history or []
+        self.history_calls = []
+        self.batches = []
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return self
+
+    def get(self, **kwargs):
+        return FakeRequest(None)
+
+    def list(self, **kwargs):
+        self.history_calls.append(kwargs)
+        return FakeRequest(self.history_pages[len(self.history_calls) - 1])
+
+
+def _client(service) -> GmailClient:
+    client = GmailClient.__new__(GmailClient)
+    client.service = service
+    return client
+
+
+def test_fetch_message_ids_since_skips_deleted_messages_and_lists_inbox_only():
+    service = FakeService(
+        outcomes={"gone": [_http_error(404)]},
+        history=[{"history": [
+            {"messagesAdded": [{"message": {"id": "m1"}}, {"message": {"id": "gone"}}]},
+            {"messagesAdded": [{"message": {"id": "m2"}}]},
+        ]}],
+    )
+    assert _client(service).fetch_message_ids_since("42") == {"m1": "<m1@x>", "m2": "<m2@x>"}
+    assert service.history_calls[0]["labelId"] == "INBOX"
+    assert service.batches == [["m1", "gone", "m2"]]
+
+
+def test_fetch_message_ids_since_returns_none_for_expired_cursor():
+    class ExpiredHistory(FakeService):
+        def list(self, **kwargs):
+            raise _http_error(404)
+
+    assert _client(ExpiredHistory()).fetch_message_ids_since("1") is None
+
+
+def test_batch_get_missing_message_raises_outside_history_path(monkeypatch):
+    monkeypatch.setattr(gmail_client.time, "sleep", lambda seconds: None)
+    service = FakeService(outcomes={"gone": [_http_error(404)]})
+    with pytest.raises(HttpError) as excinfo:
+        _client(service)._get_message_id_headers(["gone"])
+    assert excinfo.value.resp.status == 404
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(gmail_client.time, "sleep", slept.append)
+    return slept
+
+
+def test_batch_get_retries_only_the_rate_limited_ids(sleeps):
+    service = FakeService(outcomes={"b": [_http_error(429)]})
+    assert _client(service)._get_message_id_headers(["a", "b"]) == [("a", "<a@x>"), ("b", "<b@x>")]
+    assert service.batches == [["a", "b"], ["b"]]
+    assert sleeps == [gmail_client.GMAIL_BATCH_RETRY_BASE_SECONDS]
+
+
+def test_batch_get_backs_off_exponentially_then_gives_up(sleeps):
+    attempts = gmail_client.GMAIL_BATCH_MAX_RETRIES + 1
+    service = FakeService(outcomes={"a": [_http_error(503) for _ in range(attempts)]})
+    with pytest.raises(HttpError) as excinfo:
+        _client(service)._get_message_id_headers(["a"])
+    assert excinfo.value.resp.status == 503
+    assert len(service.batches) == attempts
+    assert sleeps == [gmail_client.GMAIL_BATCH_RETRY_BASE_SECONDS * 2 ** n for n in range(attempts - 1)]
+
+
+def test_batch_get_raises_non_retryable_errors_without_retrying(sleeps):
+    service = FakeService(outcomes={"b": [_http_error(404)]})
+    with pytest.raises(HttpError):
+        _client(service)._get_message_id_headers(["a", "b"])
+    assert service.batches == [["a", "b"]]
+    assert sleeps == []
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (_http_error(429), True),
+        (_http_error(500), True),
+        (_http_error(503), True),
+        (_http_error(403, b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}'), True),
+        (_http_error(403, b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}'), True),
+        (_http_error(403, b'{"error": {"errors": [{"reason": "insufficientPermissions"}]}}'), False),
+        (_http_error(404), False),
+        (_http_error(400), False),
+        (ValueError("not an HTTP error"), False),
+    ],
+)
+def test_is_retryable(error, retryable):
+    assert gmail_client._is_retryable(error) is retryable
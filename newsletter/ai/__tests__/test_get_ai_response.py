@@ -0,0 +1,63 @@
+import types
+
+import pytest
+
+from newsletter.ai import get_ai_response
+from newsletter.ai.get_ai_response import RateLimiter, get_rate_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(get_ai_response, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_rate_limiter_paces_on_the_tokens_per_minute_budget(clock):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000)
+    assert limiter.reserve(600) == 0
+    # 200 tokens in debt, refilled at 1000/60 per second
+    assert limiter.reserve(600) == pytest.approx(12)
+    clock[0] += 12
+    assert limiter.reserve(0) == 0
+
+
+def test_rate_limiter_paces_on_the_requests_per_minute_budget(clock):
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=1_000_000)
+    assert [limiter.reserve(1) for _ in range(3)] == [0, 0, pytest.approx(30)]
+    clock[0] += 60
+    assert limiter.reserve(1) == pytest.approx(0)
+
+
+def test_rate_limiter_caps_oversized_requests_at_one_minute(clock):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000)
+    assert limiter.reserve(5000) == 0
+    assert limiter.reserve(5000) == pytest.approx(60)
+
+
+@pytest.fixture
+def rate_limit_env(monkeypatch):
+    for var in ("OPENAI_REQUESTS_PER_MINUTE", "OPENAI_TOKENS_PER_MINUTE"):
+        monkeypatch.delenv(var, raising=False)
+    get_rate_limiter.cache_clear()
+    yield monkeypatch
+    get_rate_limiter.cache_clear()
+
+
+def test_get_rate_limiter_reads_limits_from_env(rate_limit_env):
+    rate_limit_env.setenv("OPENAI_REQUESTS_PER_MINUTE", "500")
+    rate_limit_env.setenv("OPENAI_TOKENS_PER_MINUTE", "30000")
+    limiter = get_rate_limiter("openai")
+    assert (limiter.requests_per_minute, limiter.tokens_per_minute) == (500, 30000)
+    assert get_rate_limiter("openai") is limiter
+
+
+@pytest.mark.parametrize("provider, env", [
+    ("openai", {}),
+    ("openai", {"OPENAI_REQUESTS_PER_MINUTE": "500"}),
+    ("unknown", {"OPENAI_REQUESTS_PER_MINUTE": "500", "OPENAI_TOKENS_PER_MINUTE": "30000"}),
+])
+def test_get_rate_limiter_is_none_without_both_limits(rate_limit_env, provider, env):
+    for var, value in env.items():
+        rate_limit_env.setenv(var, value)
+    assert get_rate_limiter(provider) is None
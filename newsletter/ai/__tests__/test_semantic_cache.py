@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from newsletter.ai.semantic_cache import SemanticCache, semantic_cache
+
+# Two-dimensional "embeddings": prompts mentioning a gig point one way, anything else the other
+EMBEDDINGS = {"gig": [1.0, 0.0], "other": [0.0, 1.0]}
+
+
+def _embed(text):
+    return EMBEDDINGS["gig" if "gig" in text.lower() else "other"]
+
+
+@pytest.fixture
+def llm(tmp_path):
+    calls = []
+
+    @semantic_cache(
+        embed=_embed,
+        threshold=0.95,
+        skip_if=lambda arguments: not arguments["use_semantic_cache"],
+        cache=SemanticCache(tmp_path),
+    )
+    def fake_call_llm(provider, model, *, system=None, user, extra_messages=None, tools=None,
+                      response_format=None, enable_web_search=False, use_semantic_cache=False):
+        calls.append(user)
+        return f"response {len(calls)}"
+
+    fake_call_llm.calls = calls
+    return fake_call_llm
+
+
+def test_near_duplicate_prompt_hits(llm):
+    first = llm("openai", "m", system=("static", "Jazz gig, 1 June"), user="Gig at the Roundhouse", use_semantic_cache=True)
+    again = llm("openai", "m", system=("static", "Jazz gig, 1 June"), user="GIG at the roundhouse!", use_semantic_cache=True)
+    assert first == again == "response 1"
+    assert llm.calls == ["Gig at the Roundhouse"]
+
+
+def test_dissimilar_prompt_misses(llm):
+    llm("openai", "m", system="static", user="Gig at the Roundhouse", use_semantic_cache=True)
+    assert llm("openai", "m", system="static", user="Quarterly survey", use_semantic_cache=True) == "response 2"
+
+
+def test_calls_that_dont_opt_in_bypass_the_cache(llm):
+    llm("openai", "m", system="static", user="Gig at the Roundhouse", use_semantic_cache=True)
+    assert llm("openai", "m", system="static", user="Gig at the Roundhouse") == "response 2"
+
+
+def test_per_call_system_suffix_shares_the_bucket_of_its_static_prefix(llm):
+    llm("openai", "m", system=("static", "Jazz gig, 1 June"), user="Gig", use_semantic_cache=True)
+    assert llm("openai", "m", system=("static", "Jazz gig, 8 June"), user="Gig", use_semantic_cache=True) == "response 1"
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        {"provider": "anthropic"},
+        {"model": "other-model"},
+        {"system": ("another static prefix", "Jazz gig, 1 June")},
+        {"extra_messages": [{"role": "assistant", "content": "earlier turn"}]},
+        {"tools": [{"type": "function", "function": {"name": "lookup"}}]},
+        {"enable_web_search": True},
+        {"response_format": {"type": "json_object"}},
+    ],
+)
+def test_request_options_select_separate_buckets(llm, changed):
+    request = {"provider": "openai", "model": "m", "system": ("static", "Jazz gig, 1 June"), "user": "Gig"}
+    llm(**request, use_semantic_cache=True)
+    assert llm(**{**request, **changed}, use_semantic_cache=True) == "response 2"
+
+
+def test_buckets_persist_across_instances(tmp_path):
+    vector = np.array([1.0, 0.0], dtype=np.float32)
+    SemanticCache(tmp_path).add("bucket", vector, "stored")
+    assert SemanticCache(tmp_path).lookup("bucket", vector, 0.95) == "stored"
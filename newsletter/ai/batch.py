@@ -0,0 +1,179 @@
+"""
+Bulk LLM calls through the providers' asynchronous Batch APIs.
+
+Batch jobs are billed at ~50% of the real-time price and use a separate rate-limit
+pool, at the cost of latency (up to 24h). That suits the nightly pipelines, so
+`call_llm_batch` routes through them when BATCH_MODE=true and otherwise falls
+back to concurrent real-time calls.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import orjson
+
+from newsletter.ai.constants import PROVIDER_ANTHROPIC, PROVIDER_OPENAI
+from newsletter.ai.get_ai_response import (
+    _anthropic_text,
+    _build_anthropic_params,
+    _build_openai_params,
+    _getenv,
+    call_llm,
+    get_anthropic_client,
+    get_openai_client,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def batch_mode_enabled() -> bool:
+    """BATCH_MODE=true routes bulk extraction through the Batch APIs (read on use, after `.env`)."""
+    return (_getenv("BATCH_MODE") or "false").lower() == "true"
+
+
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL_SECONDS = 60
+
+# Real-time calls run on a thread pool; pacing and retries come from `call_llm` itself
+REALTIME_LLM_WORKERS = 10
+
+_OPENAI_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _openai_body(job: Dict[str, Any]) -> Dict[str, Any]:
+    params = _build_openai_params(
+        job["model"], job.get("system"), job["user"], job.get("extra_messages") or [],
+        job.get("temperature", 0.2), job.get("max_tokens", 12000), job.get("timeout", 180),
+        job.get("tools"), job.get("response_format"), False, None,
+    )
+    # `timeout` is a client option, not part of the request body
+    params.pop("timeout", None)
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def _anthropic_params(job: Dict[str, Any]) -> Dict[str, Any]:
+    params = _build_anthropic_params(
+        job["model"], job.get("system"), job["user"], job.get("extra_messages") or [],
+        job.get("temperature", 0.2), job.get("max_tokens", 12000), False, None,
+    )
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def submit_openai_batch(jobs: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Upload `{custom_id: call_llm kwargs}` as a JSONL batch, wait for it to finish and
+    return `{custom_id: content}` for every request that succeeded.
+    """
+    lines = [
+        orjson.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _openai_body(job),
+        })
+        for custom_id, job in jobs.items()
+    ]
+    batch_file = get_openai_client().files.create(
+        file=("batch.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = get_openai_client().batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window=BATCH_COMPLETION_WINDOW,
+    )
+    logger.info("📦 Submitted OpenAI batch %s with %s requests.", batch.id, len(lines))
+
+    while batch.status not in _OPENAI_TERMINAL_STATUSES:
+        time.sleep(BATCH_POLL_INTERVAL_SECONDS)
+        batch = get_openai_client().batches.retrieve(batch.id)
+        logger.info("⏳ OpenAI batch %s status: %s", batch.id, batch.status)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        logger.error("🛑 OpenAI batch %s ended with status '%s'.", batch.id, batch.status)
+        return {}
+
+    results: Dict[str, str] = {}
+    for line in get_openai_client().files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            logger.warning("⚠️ Batch request %s failed: %s", record.get('custom_id'), record.get('error'))
+            continue
+        results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+
+def submit_anthropic_batch(jobs: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Anthropic Message Batches equivalent of `submit_openai_batch`.
+    """
+    batch = get_anthropic_client().messages.batches.create(
+        requests=[
+            {"custom_id": custom_id, "params": _anthropic_params(job)}
+            for custom_id, job in jobs.items()
+        ]
+    )
+    logger.info("📦 Submitted Anthropic batch %s with %s requests.", batch.id, len(jobs))
+
+    while batch.processing_status != "ended":
+        time.sleep(BATCH_POLL_INTERVAL_SECONDS)
+        batch = get_anthropic_client().messages.batches.retrieve(batch.id)
+        logger.info("⏳ Anthropic batch %s status: %s", batch.id, batch.processing_status)
+
+    results: Dict[str, str] = {}
+    for entry in get_anthropic_client().messages.batches.results(batch.id):
+        if entry.result.type != "succeeded":
+            logger.warning("⚠️ Batch request %s failed: %s", entry.custom_id, entry.result.type)
+            continue
+        results[entry.custom_id] = _anthropic_text(entry.result.message)
+    return results
+
+
+def _call_llm_realtime(jobs: List[Dict[str, Any]]) -> List[str]:
+    """`[call_llm(**job) for job in jobs]`, with up to REALTIME_LLM_WORKERS calls in flight."""
+    with ThreadPoolExecutor(max_workers=REALTIME_LLM_WORKERS) as pool:
+        return list(pool.map(lambda job: call_llm(**job), jobs))
+
+
+_SUBMITTERS = {
+    PROVIDER_OPENAI: submit_openai_batch,
+    PROVIDER_ANTHROPIC: submit_anthropic_batch,
+}
+
+
+def call_llm_batch(jobs: List[Dict[str, Any]], batch_mode: bool | None = None) -> List[str]:
+    """
+    Run many `call_llm` requests (each a dict of its kwargs) and return results in order.
+
+    With `batch_mode` (default: `batch_mode_enabled()`) the jobs go through the provider
+    Batch APIs; web-search jobs (not supported there) and any failed batch entries fall
+    back to real-time calls.
+    """
+    if batch_mode is None:
+        batch_mode = batch_mode_enabled()
+    if not batch_mode:
+        return _call_llm_realtime(jobs)
+
+    results: List[str | None] = [None] * len(jobs)
+    by_provider: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for idx, job in enumerate(jobs):
+        if job.get("enable_web_search") or job["provider"] not in _SUBMITTERS:
+            continue
+        by_provider.setdefault(job["provider"], {})[str(idx)] = job
+
+    for provider, provider_jobs in by_provider.items():
+        for custom_id, content in _SUBMITTERS[provider](provider_jobs).items():
+            results[int(custom_id)] = content
+
+    pending = [idx for idx, result in enumerate(results) if result is None]
+    if pending:
+        logger.info("🔁 Running %s request(s) in real time (web search or failed in batch).", len(pending))
+        for idx, content in zip(pending, _call_llm_realtime([jobs[idx] for idx in pending])):
+            results[idx] = content
+    return results
@@ -1,51 +1,451 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import inspect
+import io
 import os
+import threading
+import time
+import weakref
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 import logging
 
 import anthropic
-from openai import OpenAI, OpenAIError
+import openai
+import orjson
+from openai import APIStatusError, AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    RetryCallState,
+    before_sleep_log,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
+from newsletter.ai.semantic_cache import semantic_cache
+from newsletter.utils.caching import disk_cache
 from newsletter.utils.utils import timed
 
-# ──────────────────────────────── env ──────────────────────────────
-load_dotenv(dotenv_path=Path(".env"))
+# ──────────────────────────── clients ──────────────────────────────
+# Clients are built on first use, so importing this module (e.g. from a script that
+# only touches one provider) doesn't read the environment or open connection pools.
+def _getenv(env_var: str) -> Optional[str]:
+    """`os.getenv` after loading `.env`, for settings read on first use rather than at import."""
+    load_dotenv(dotenv_path=Path(".env"))
+    return os.getenv(env_var)
+
+
+def _api_key(env_var: str) -> str:
+    key = _getenv(env_var)
+    if not key:
+        raise EnvironmentError(f"{env_var} not set in environment.")
+    return key
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client() -> OpenAI:
+    return OpenAI(api_key=_api_key("OPENAI_API_KEY"), max_retries=0)
+
+
+@functools.lru_cache(maxsize=None)
+def get_anthropic_client() -> anthropic.Anthropic:
+    return anthropic.Anthropic(api_key=_api_key("ANTHROPIC_API_KEY"), max_retries=0)
+
 
-OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-ANTHROPIC_KEY = os.getenv("ANTHROPIC_API_KEY")
+# Async clients pool connections on the loop that first used them, and each
+# `asyncio.run` (e.g. one per `classify_many` call) starts a fresh loop, so cache them per loop.
+_openai_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_anthropic_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, anthropic.AsyncAnthropic]" = weakref.WeakKeyDictionary()
 
-if not OPENAI_KEY:
-    raise EnvironmentError("OPENAI_API_KEY not set in environment.")
-if not ANTHROPIC_KEY:
-    raise EnvironmentError("ANTHROPIC_API_KEY not set in environment.")
 
-openai_client = OpenAI(api_key=OPENAI_KEY, max_retries=0)
-anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_KEY, max_retries=0)
+def get_openai_async_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    if loop not in _openai_async_clients:
+        _openai_async_clients[loop] = AsyncOpenAI(api_key=_api_key("OPENAI_API_KEY"), max_retries=0)
+    return _openai_async_clients[loop]
+
+
+def get_anthropic_async_client() -> anthropic.AsyncAnthropic:
+    loop = asyncio.get_running_loop()
+    if loop not in _anthropic_async_clients:
+        _anthropic_async_clients[loop] = anthropic.AsyncAnthropic(api_key=_api_key("ANTHROPIC_API_KEY"), max_retries=0)
+    return _anthropic_async_clients[loop]
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ────────────────────────── retry decorator ────────────────────────
+# Only transient failures are retried; bad requests fail fast.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    anthropic.RateLimitError,
+    anthropic.APITimeoutError,
+    anthropic.APIConnectionError,
+    anthropic.InternalServerError,
+)
+RETRY_MAX_WAIT_SECONDS = 60
+
+# Full jitter, so concurrent workers don't retry in lock-step
+_backoff = wait_random_exponential(min=1, max=RETRY_MAX_WAIT_SECONDS)
+
+
+def _wait_retry_after_or_backoff(retry_state: RetryCallState) -> float:
+    """Honour a server-supplied Retry-After (e.g. on 429s), else use jittered backoff."""
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), RETRY_MAX_WAIT_SECONDS)
+    except (TypeError, ValueError):
+        return _backoff(retry_state)
+
+
 retry_call = retry(
-    wait=wait_exponential(multiplier=1, min=4, max=60),
+    wait=_wait_retry_after_or_backoff,
     stop=stop_after_attempt(5),
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
     reraise=True,
 )
 
 
+# ──────────────────────────── throttling ───────────────────────────
+class RateLimiter:
+    """
+    Thread-safe token buckets for a provider's requests- and tokens-per-minute limits,
+    each refilled continuously at limit/60 per second.
+
+    `reserve(tokens)` books one request plus `tokens` immediately (the buckets may go
+    into debt) and returns how many seconds the caller must wait before sending, so
+    the same limiter paces sync callers (`time.sleep`) and coroutines (`asyncio.sleep`)
+    without holding a lock while they wait.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests_available = requests_per_minute
+        self._tokens_available = tokens_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._updated = now - self._updated, now
+            self._requests_available = min(
+                self.requests_per_minute, self._requests_available + elapsed * self.requests_per_minute / 60
+            )
+            self._tokens_available = min(
+                self.tokens_per_minute, self._tokens_available + elapsed * self.tokens_per_minute / 60
+            )
+            self._requests_available -= 1
+            # A request larger than a whole minute's budget would otherwise never fit
+            self._tokens_available -= min(tokens, self.tokens_per_minute)
+            return max(
+                0.0,
+                -self._requests_available * 60 / self.requests_per_minute,
+                -self._tokens_available * 60 / self.tokens_per_minute,
+            )
+
+
+# Env var prefix of each provider's limits; unset limits leave throttling to the
+# retry decorator's 429 handling
+RATE_LIMIT_ENV_PREFIXES = {"openai": "OPENAI", "anthropic": "ANTHROPIC"}
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limiter(provider: str) -> Optional[RateLimiter]:
+    """
+    The provider's shared limiter, from `<PREFIX>_REQUESTS_PER_MINUTE` and
+    `<PREFIX>_TOKENS_PER_MINUTE` (read on first use), or None if either is unset.
+    """
+    prefix = RATE_LIMIT_ENV_PREFIXES.get(provider)
+    if prefix is None:
+        return None
+    rpm, tpm = _getenv(f"{prefix}_REQUESTS_PER_MINUTE"), _getenv(f"{prefix}_TOKENS_PER_MINUTE")
+    if not rpm or not tpm:
+        return None
+    return RateLimiter(requests_per_minute=float(rpm), tokens_per_minute=float(tpm))
+
+
+def _throttle_delay(
+        provider: str,
+        system: Optional[SystemPrompt],
+        user: str,
+        extra_messages: List[Dict[str, Any]],
+        max_tokens: int,
+) -> float:
+    """
+    Seconds to wait before sending this request under the provider's limits. Tokens
+    are estimated as ~4 characters each plus `max_tokens`, which is what providers
+    count against TPM when admitting a request.
+    """
+    limiter = get_rate_limiter(provider)
+    if limiter is None:
+        return 0.0
+    chars = len(_system_text(system) or "") + len(user) + sum(len(str(m.get("content", ""))) for m in extra_messages)
+    return limiter.reserve(tokens=chars // 4 + max_tokens)
+
+
+# ─────────────────────────── instrumentation ───────────────────────
+def _log_llm_call(
+        stage: Optional[str],
+        provider: str,
+        model: str,
+        started: float,
+        prompt_tokens: Optional[int],
+        completion_tokens: Optional[int],
+) -> None:
+    """
+    One JSON line per provider round-trip (cache hits never get here), so latency
+    and token spend can be aggregated per pipeline stage.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info("%s", orjson.dumps({
+        "event": "llm_call",
+        "stage": stage,
+        "provider": provider,
+        "model": model,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    }).decode())
+
+
+# ─────────────────────────── response cache ────────────────────────
+# Identical requests (e.g. re-running a batch after a crash) are served from disk.
+LLM_CACHE_TTL_DAYS = 30
+LLM_CACHE_MAX_TEMPERATURE = 0.5
+LLM_CACHE_KEY_ARGS = (
+    "provider", "model", "system", "user", "extra_messages", "temperature",
+    "max_tokens", "response_format", "tools", "enable_web_search",
+)
+
+
+def _is_non_deterministic(arguments: Dict[str, Any]) -> bool:
+    """High-temperature and web-search calls are not worth replaying from cache."""
+    return arguments["temperature"] > LLM_CACHE_MAX_TEMPERATURE or arguments["enable_web_search"]
+
+
+def _request_key(arguments: Dict[str, Any]) -> str:
+    """SHA-256 over the request-defining arguments (the same fields the disk cache keys on)."""
+    payload = {k: arguments[k] for k in LLM_CACHE_KEY_ARGS}
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+
+# In-flight async requests, keyed by (event loop, request key)
+_inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+
+def _single_flight(func):
+    """
+    Coalesce concurrent identical calls: the first caller performs the request and
+    every duplicate issued while it is in flight awaits the same result.
+    """
+    sig = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        bound_args = sig.bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        key = (asyncio.get_running_loop(), _request_key(bound_args.arguments))
+
+        if key in _inflight:
+            logger.info("🔗 Joining in-flight LLM call %s", key[1][:12])
+            return await asyncio.shield(_inflight[key])
+
+        fut = key[0].create_future()
+        _inflight[key] = fut
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved so an un-awaited failure isn't logged as lost
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            _inflight.pop(key, None)
+
+    return wrapper
+
+
+def _semantic_cache_threshold() -> Optional[float]:
+    """Near-duplicate tier for `use_semantic_cache=True` calls: set e.g. LLM_SEMANTIC_CACHE_THRESHOLD=0.95 to enable."""
+    threshold = _getenv("LLM_SEMANTIC_CACHE_THRESHOLD")
+    return float(threshold) if threshold else None
+
+
+SEMANTIC_CACHE_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def _embed(text: str) -> List[float]:
+    resp = get_openai_client().embeddings.create(model=SEMANTIC_CACHE_EMBEDDING_MODEL, input=text)
+    return resp.data[0].embedding
+
+
+# ───────────────────────── request builders ────────────────────────
+# A system prompt is either plain text or a (static_prefix, dynamic_suffix) pair
+# as returned by the `construct_*` builders in `newsletter.ai.prompts`.
+SystemPrompt = Union[str, Tuple[str, str]]
+
+
+def _system_text(system: Optional[SystemPrompt]) -> Optional[str]:
+    if isinstance(system, (tuple, list)):
+        return "\n\n".join(part for part in system if part)
+    return system
+
+
+def _anthropic_system(system: Optional[SystemPrompt]) -> Any:
+    """
+    Mark the static prefix of a split system prompt as cacheable, so repeat calls
+    are billed at the cached-input rate and skip re-processing the shared prefix.
+    """
+    if not isinstance(system, (tuple, list)):
+        return system
+    prefix, suffix = system
+    blocks = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    if suffix:
+        blocks.append({"type": "text", "text": suffix})
+    return blocks
+
+
+def _build_openai_params(
+        model: str,
+        system: Optional[SystemPrompt],
+        user: str,
+        extra_messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+        timeout: int,
+        tools: Optional[List[Dict[str, Any]]],
+        response_format: Optional[Dict[str, str]],
+        enable_web_search: bool,
+        web_search_options: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    # OpenAI caches shared prompt prefixes automatically, so the static part just goes first.
+    system = _system_text(system)
+    messages = (
+            ([{"role": "system", "content": system}] if system else [])
+            + [{"role": "user", "content": user}]
+            + extra_messages
+    )
+
+    openai_params: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+    if enable_web_search and web_search_options:
+        # Caller should ensure 'model' is search-enabled (e.g., gpt-4o-mini-search-preview);
+        # search models reject temperature, tools and response_format.
+        openai_params["web_search_options"] = web_search_options
+    else:
+        openai_params["temperature"] = temperature
+        openai_params["timeout"] = timeout
+        if tools is not None:
+            openai_params["tools"] = tools
+        if response_format is not None:
+            openai_params["response_format"] = response_format
+    return openai_params
+
+
+def _build_anthropic_params(
+        model: str,
+        system: Optional[SystemPrompt],
+        user: str,
+        extra_messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+        enable_web_search: bool,
+        web_search_options: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    anthropic_messages = [
+        {"role": "user", "content": [{"type": "text", "text": user}]}
+    ]
+    if extra_messages:
+        for m in extra_messages:
+            anthropic_messages.append(
+                {
+                    "role": m["role"],
+                    "content": [{"type": "text", "text": m["content"]}],
+                }
+            )
+
+    anthropic_params: Dict[str, Any] = {
+        "model": model,
+        "system": _anthropic_system(system),
+        "messages": anthropic_messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+    anthropic_tool_list = None
+    if enable_web_search:
+        # Use Anthropic's specific web search tool
+        # For now, generic 'tools' param is ignored if 'enable_web_search' is true for Anthropic
+        max_uses = 5
+        if web_search_options and "max_uses" in web_search_options and isinstance(web_search_options["max_uses"],
+                                                                                  int):
+            max_uses = web_search_options["max_uses"]
+        anthropic_tool_list = [{
+            "type": "web_search_20250305",
+            "name": "web_search",
+            "max_uses": max_uses
+        }]
+
+    if anthropic_tool_list:
+        anthropic_params["tools"] = anthropic_tool_list
+    return anthropic_params
+
+
+def _anthropic_text(resp: Any) -> str:
+    # Extract text content. This should work even if the model used a tool internally (like web search)
+    # and then produced a final text response.
+    buf = io.StringIO()
+    for blk in resp.content:
+        if blk.type == "text":
+            buf.write(blk.text)
+    return buf.getvalue()
+
+
 # ───────────────────────── unified call_llm ────────────────────────
+@disk_cache(
+    cache_subdirectory_name="llm_responses",
+    ttl_days=LLM_CACHE_TTL_DAYS,
+    key_args=LLM_CACHE_KEY_ARGS,
+    skip_if=_is_non_deterministic,
+)
+@semantic_cache(
+    embed=_embed,
+    threshold=_semantic_cache_threshold,
+    skip_if=lambda arguments: (
+        not arguments["use_semantic_cache"] or arguments["temperature"] > LLM_CACHE_MAX_TEMPERATURE
+    ),
+)
 @timed("LLM call")
 @retry_call
 def call_llm(
         provider: str,
         model: str,
         *,
-        system: Optional[str] = None,
+        system: Optional[SystemPrompt] = None,
         user: str,
         extra_messages: Optional[List[Dict[str, Any]]] = None,
         temperature: float = 0.2,
@@ -55,96 +455,120 @@ def call_llm(
         response_format: Optional[Dict[str, str]] = None,
         enable_web_search: bool = False,
         web_search_options: Optional[Dict[str, Any]] = None,
+        stage: Optional[str] = None,
+        use_semantic_cache: bool = False,
 ) -> str:
     """
     Unified wrapper for OpenAI & Anthropic chat completions.
     Can enable web search for supported providers/models.
+    Deterministic calls are cached on disk for `LLM_CACHE_TTL_DAYS`. Calls made with
+    `use_semantic_cache=True` can additionally be served a near-duplicate prompt's
+    response, when LLM_SEMANTIC_CACHE_THRESHOLD is set.
+
+    `stage` only labels the call in the per-call latency/token log line.
 
-    Returns the raw text response (ready for json.loads if applicable).
+    Returns the raw text response (ready for orjson.loads if applicable).
     """
     extra_messages = extra_messages or []
+    delay = _throttle_delay(provider, system, user, extra_messages, max_tokens)
+    if delay:
+        time.sleep(delay)
 
     if provider == "openai":
-        messages = (
-                ([{"role": "system", "content": system}] if system else [])
-                + [{"role": "user", "content": user}]
-                + extra_messages
+        openai_params = _build_openai_params(
+            model, system, user, extra_messages, temperature, max_tokens, timeout,
+            tools, response_format, enable_web_search, web_search_options,
         )
+        started = time.perf_counter()
+        try:
+            resp = get_openai_client().chat.completions.create(**openai_params)
+        except APIStatusError as e:
+            # Timeouts / connection errors carry no response; they are re-raised untouched
+            logger.error("Status %s\n%s", e.status_code, e.response.text)
+            raise
+        usage = resp.usage
+        _log_llm_call(stage, provider, model, started,
+                      usage and usage.prompt_tokens, usage and usage.completion_tokens)
+        return resp.choices[0].message.content
+
+    elif provider == "anthropic":
+        anthropic_params = _build_anthropic_params(
+            model, system, user, extra_messages, temperature, max_tokens,
+            enable_web_search, web_search_options,
+        )
+        started = time.perf_counter()
+        resp = get_anthropic_client().messages.create(**anthropic_params)
+        usage = resp.usage
+        _log_llm_call(stage, provider, model, started,
+                      usage and usage.input_tokens, usage and usage.output_tokens)
+        return _anthropic_text(resp)
+
+    raise ValueError(f"Unsupported provider: {provider}")
 
-        openai_params: Dict[str, Any] = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "timeout": timeout,
-            "tools": tools,
-            "response_format": response_format,
-        }
-        if enable_web_search:
-            # Caller should ensure 'model' is search-enabled (e.g., gpt-4o-mini-search-preview)
-            if web_search_options:
-                openai_params["web_search_options"] = web_search_options
-                del openai_params["response_format"]
-                del openai_params["timeout"]
-                del openai_params["tools"]
-                del openai_params["temperature"]
-            # If 'tools' is also provided along with enable_web_search for OpenAI,
-            # ensure they are compatible or handled as expected by OpenAI API.
-            # For now, we pass both if provided.
 
+# ───────────────────────── async acall_llm ─────────────────────────
+@disk_cache(
+    cache_subdirectory_name="llm_responses",
+    ttl_days=LLM_CACHE_TTL_DAYS,
+    key_args=LLM_CACHE_KEY_ARGS,
+    skip_if=_is_non_deterministic,
+)
+@_single_flight
+@timed("Async LLM call")
+@retry_call
+async def acall_llm(
+        provider: str,
+        model: str,
+        *,
+        system: Optional[SystemPrompt] = None,
+        user: str,
+        extra_messages: Optional[List[Dict[str, Any]]] = None,
+        temperature: float = 0.2,
+        max_tokens: int = 12000,
+        timeout: int = 180,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        response_format: Optional[Dict[str, str]] = None,
+        enable_web_search: bool = False,
+        web_search_options: Optional[Dict[str, Any]] = None,
+        stage: Optional[str] = None,
+) -> str:
+    """
+    Async twin of `call_llm` (same arguments, same on-disk cache) for overlapping
+    many I/O-bound requests, e.g. the batched newsletter classification. Identical
+    requests issued concurrently share a single provider call.
+    """
+    extra_messages = extra_messages or []
+    delay = _throttle_delay(provider, system, user, extra_messages, max_tokens)
+    if delay:
+        await asyncio.sleep(delay)
+
+    if provider == "openai":
+        openai_params = _build_openai_params(
+            model, system, user, extra_messages, temperature, max_tokens, timeout,
+            tools, response_format, enable_web_search, web_search_options,
+        )
+        started = time.perf_counter()
         try:
-            resp = openai_client.chat.completions.create(**openai_params)
-        except OpenAIError as e:
-            logger.error("Status %s\n%s", e.status_code, e.response.json())
+            resp = await get_openai_async_client().chat.completions.create(**openai_params)
+        except APIStatusError as e:
+            # Timeouts / connection errors carry no response; they are re-raised untouched
+            logger.error("Status %s\n%s", e.status_code, e.response.text)
             raise
+        usage = resp.usage
+        _log_llm_call(stage, provider, model, started,
+                      usage and usage.prompt_tokens, usage and usage.completion_tokens)
         return resp.choices[0].message.content
 
     elif provider == "anthropic":
-        anthropic_messages = [
-            {"role": "user", "content": [{"type": "text", "text": user}]}
-        ]
-        if extra_messages:
-            for m in extra_messages:
-                anthropic_messages.append(
-                    {
-                        "role": m["role"],
-                        "content": [{"type": "text", "text": m["content"]}],
-                    }
-                )
-
-        anthropic_params: Dict[str, Any] = {
-            "model": model,
-            "system": system,
-            "messages": anthropic_messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
-
-        anthropic_tool_list = None
-        if enable_web_search:
-            # Use Anthropic's specific web search tool
-            # For now, generic 'tools' param is ignored if 'enable_web_search' is true for Anthropic
-            max_uses = 5
-            if web_search_options and "max_uses" in web_search_options and isinstance(web_search_options["max_uses"],
-                                                                                      int):
-                max_uses = web_search_options["max_uses"]
-            anthropic_tool_list = [{
-                "type": "web_search_20250305",
-                "name": "web_search",
-                "max_uses": max_uses
-            }]
-
-        if anthropic_tool_list:
-            anthropic_params["tools"] = anthropic_tool_list
-
-        resp = anthropic_client.messages.create(**anthropic_params)
-
-        # Extract text content. This should work even if the model used a tool internally (like web search)
-        # and then produced a final text response.
-        final_text_parts = []
-        for blk in resp.content:
-            if blk.type == "text":
-                final_text_parts.append(blk.text)
-        return "".join(final_text_parts)
+        anthropic_params = _build_anthropic_params(
+            model, system, user, extra_messages, temperature, max_tokens,
+            enable_web_search, web_search_options,
+        )
+        started = time.perf_counter()
+        resp = await get_anthropic_async_client().messages.create(**anthropic_params)
+        usage = resp.usage
+        _log_llm_call(stage, provider, model, started,
+                      usage and usage.input_tokens, usage and usage.output_tokens)
+        return _anthropic_text(resp)
 
     raise ValueError(f"Unsupported provider: {provider}")
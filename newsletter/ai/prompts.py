@@ -1,38 +1,50 @@
 """
 Centralized definitions for system prompts and prompt construction utilities.
+
+Each `construct_*` builder returns a `(static_prefix, dynamic_suffix)` pair: the prefix
+is identical across a run (so providers can cache it), the suffix carries per-call data.
+Builders are memoized, so arguments must be hashable (tuples, not lists).
 """
+import functools
+
+# Example values for the web-search output format, looked up once per field name
+# instead of walking an if/elif chain.
+_EXAMPLE_BY_FIELD = {
+    "vibes_tags": "item1, item2 or Not found",
+    "event_types": "item1, item2 or Not found",
+    "target_audiences": "item1, item2 or Not found",
+    "location_type": "venue or online or tbc",
+    "booking_type": "required or recommended or tbc",
+    "occurrence_type": "one_off or recurring or tbc",
+}
+_EXAMPLE_BY_SUBSTRING = (
+    ("date", "YYYY-MM-DD or Not found"),
+    ("time", "HH:MM:SS or Not found"),
+    ("url", "https://example.com or Not found"),
+    ("postcode", "AA1 1AA or Not found"),
+    ("is_", "true/false or Not found"),
+)
+_DEFAULT_EXAMPLE = "Sample value or Not found"
+
+
+def _example_value(field_name: str) -> str:
+    # Substring patterns take priority, then exact field names, then the generic fallback
+    return next(
+        (value for pattern, value in _EXAMPLE_BY_SUBSTRING if pattern in field_name),
+        _EXAMPLE_BY_FIELD.get(field_name, _DEFAULT_EXAMPLE),
+    )
 
 
+@functools.lru_cache(maxsize=64)
 def construct_web_search_system_prompt(
         fields_to_retrieve_txt: str,
-        field_names_for_example: list[str],
+        field_names_for_example: tuple[str, ...],
         current_event_info_txt: str,
-) -> str:
+) -> tuple[str, str]:
     # Programmatically generate the example output string based on the provided field names
-    example_output_lines = []
-    for field_name in field_names_for_example:
-        example_value = "Sample value or Not found"  # Default example
-        if "date" in field_name:
-            example_value = "YYYY-MM-DD or Not found"
-        elif "time" in field_name:
-            example_value = "HH:MM:SS or Not found"
-        elif "url" in field_name:
-            example_value = "https://example.com or Not found"
-        elif "postcode" in field_name:
-            example_value = "AA1 1AA or Not found"
-        elif "is_" in field_name:
-            example_value = "true/false or Not found"
-        elif field_name in ["vibes_tags", "event_types", "target_audiences"]:
-            example_value = "item1, item2 or Not found"
-        elif field_name == "location_type":
-            example_value = "venue or online or tbc"
-        elif field_name == "booking_type":
-            example_value = "required or recommended or tbc"
-        elif field_name == "occurrence_type":
-            example_value = "one_off or recurring or tbc"
-        # Add more specific examples as needed
-        example_output_lines.append(f"{field_name}: {example_value}")
-    example_output_str = "\n".join(example_output_lines)
+    example_output_str = "\n".join(
+        f"{field_name}: {_example_value(field_name)}" for field_name in field_names_for_example
+    )
 
     prompt = f"""
 <role>
@@ -47,14 +59,6 @@ The final output will be used by another AI to refine a structured event record.
 Therefore, the summary you provide must be factual, precise, and clearly organized according to the schema and output guidelines below.
 </task_overview>
 
-<current_event_information>
-This is the information we currently have for the event. Use this as context. 
-Focus on verifying these details and finding any missing information based on the schema below. If a field here has a plausible value, prioritize confirming it or finding more precise details rather than replacing it wholesale unless it's clearly incorrect.
-```text
-{current_event_info_txt}
-```
-</current_event_information>
-
 <information_to_retrieve_schema>
 Based on the provided event query and current information, conduct a web search and focus on gathering/verifying information for the following fields. Prioritize official sources.
 
@@ -83,15 +87,26 @@ Then, to ensure this summary is easily parsable by another AI and that all criti
 - Do NOT give me summaries or information about other events that are on. If there is no information about other events that are on.  
 </tips>
 """
-    return prompt.strip()
+    current_event_information = f"""
+<current_event_information>
+This is the information we currently have for the event. Use this as context. 
+Focus on verifying these details and finding any missing information based on the schema above. If a field here has a plausible value, prioritize confirming it or finding more precise details rather than replacing it wholesale unless it's clearly incorrect.
+```text
+{current_event_info_txt}
+```
+</current_event_information>
+"""
+    return prompt.strip(), current_event_information.strip()
 
 
 # ─────────── Event Refinement System Prompt (for _enrich_via_web_search) ────────────
+@functools.lru_cache(maxsize=64)
 def construct_event_refinement_system_prompt(
         refinement_schema_context: str,
         relevant_enums_txt: str
-) -> str:
-    return f"""
+) -> tuple[str, str]:
+    # Everything here is stable for the whole run, so the dynamic suffix is empty.
+    prompt = f"""
 You are an AI assistant tasked with refining a (likely) partially complete JSON object representing an event, using information from a web search summary.
 Your goal is to update the 'Current Event JSON' with more accurate and/or complete data found in the 'Web Search Summary'.
 
@@ -131,27 +146,43 @@ Focus on enriching: `title`, `summary`, `start_date`, `end_date`, `start_time`,
 - the start and end dates, if not known, should be None, not `tbc`
 - the recurrence_rule, if necessary, should be represented as an RRULE.   
 </tips>
-    """.strip()
+    """
+    return prompt.strip(), ""
 
 
 # ───────────── Event Extraction System Prompt (for extract_events) ─────────────────
+@functools.lru_cache(maxsize=64)
 def construct_extract_events_sys_prompt(
         day_name: str,
         email_sent_date: str,
         fields_txt: str,
         schema_txt: str,
         enums_txt: str,
-) -> str:
-    return f"""
+        packed: bool = False,
+) -> tuple[str, str]:
+    """
+    `(static system prompt, per-send-date context)`. With `packed`, the user message
+    holds several `<email id="...">` blocks (see `construct_packed_emails_user_prompt`)
+    and `schema_txt` is the `{"results": [...]}` wrapper schema.
+    """
+    if packed:
+        output_shape = (
+            '{ "results": [ { "email_message_id": "<id of the <email> block>", '
+            '"events": [ list of event objects infilled (where possible) fields from <schema> ] }, ... ] }\n\n'
+            '    • The user message holds several independent <email id="..."> blocks. Return exactly one '
+            'results entry per block, with email_message_id copied verbatim from its id attribute, '
+            'and "events": [] if it has none.'
+        )
+    else:
+        output_shape = '{ "events": [ list of event objects infilled (where possible) fields from <schema> ] }'
+    prompt = f"""
     <role>
     You extract events from emails sent from digital newsletters and/or mailing lists into a structured and syntactically correct JSON format for an events database.
     </role>
 
     <task>
-    E-mail send-date: {day_name} {email_sent_date or 'UNKNOWN'} (weekday YYYY-MM-DD).
-
     Return **ONE** JSON object only:
-    {{ "events": [ list of event objects infilled (where possible) fields from <schema> ] }}
+    {output_shape}
 
     Rules:
     • Fill start_date (YYYY-MM-DD) for every event.
@@ -205,4 +236,26 @@ def construct_extract_events_sys_prompt(
     <output_format>
     Return valid JSON only—no markdown fences or commentary.
     </output_format>
-        """.strip()
+        """
+    email_context = f"""
+    <email_context>
+    E-mail send-date: {day_name} {email_sent_date or 'UNKNOWN'} (weekday YYYY-MM-DD).
+    Resolve relative dates in the e-mail (e.g. "this Friday") against this send-date.
+    </email_context>
+        """
+    return prompt.strip(), email_context.strip()
+
+
+def construct_packed_emails_user_prompt(emails: list[tuple[str, str]]) -> str:
+    """
+    User message carrying several short e-mails (same send-date) in one extraction
+    request, one `<email id="...">` block per `(message_id, body)`. The packed system
+    prompt asks for one `results` entry per block, keyed by that message id.
+    """
+    emails_txt = "\n\n".join(
+        f'<email id="{message_id}">\n{body}\n</email>' for message_id, body in emails
+    )
+    return (
+        f"The following {len(emails)} e-mails are independent of each other; extract the events "
+        f"of every one of them.\n\n{emails_txt}"
+    )
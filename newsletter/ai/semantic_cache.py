@@ -0,0 +1,172 @@
+"""
+Near-duplicate (semantic) response cache for LLM calls.
+
+Exact-match caching misses prompts that differ only cosmetically (e.g. the same
+event re-listed by two newsletters). This tier embeds the per-call part of the
+prompt and returns a stored response when a previous prompt in the same bucket
+(provider, model, static system prefix and request options) is more similar than
+the configured cosine threshold.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import typing as ta
+
+import numpy as np
+import orjson
+
+from newsletter.utils.caching import CACHE_BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_DIR = CACHE_BASE_DIR / "llm_semantic"
+
+
+class SemanticCache:
+    """
+    Brute-force inner-product index over L2-normalised embeddings, one bucket per
+    `_bucket_key`. Buckets are persisted as `.npy` + `.json` pairs.
+    """
+
+    def __init__(self, cache_dir=SEMANTIC_CACHE_DIR) -> None:
+        self.cache_dir = cache_dir
+        self._vectors: dict[str, np.ndarray] = {}
+        self._responses: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, bucket: str) -> None:
+        if bucket in self._vectors:
+            return
+        vec_file = self.cache_dir / f"{bucket}.npy"
+        resp_file = self.cache_dir / f"{bucket}.json"
+        try:
+            self._vectors[bucket] = np.load(vec_file)
+            with open(resp_file, "r", encoding="utf-8") as f:
+                self._responses[bucket] = json.load(f)
+        except (IOError, ValueError):
+            self._vectors[bucket] = np.empty((0, 0), dtype=np.float32)
+            self._responses[bucket] = []
+
+    def lookup(self, bucket: str, vector: np.ndarray, threshold: float) -> str | None:
+        with self._lock:
+            self._load(bucket)
+            vectors = self._vectors[bucket]
+            if not len(vectors):
+                return None
+            scores = vectors @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                logger.info("🧠 Semantic cache HIT (similarity %.3f) in bucket %s", scores[best], bucket[:8])
+                return self._responses[bucket][best]
+            return None
+
+    def add(self, bucket: str, vector: np.ndarray, response: str) -> None:
+        with self._lock:
+            self._load(bucket)
+            vectors = self._vectors[bucket]
+            self._vectors[bucket] = np.vstack([vectors, vector]) if len(vectors) else vector[np.newaxis, :]
+            self._responses[bucket].append(response)
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                np.save(self.cache_dir / f"{bucket}.npy", self._vectors[bucket])
+                with open(self.cache_dir / f"{bucket}.json", "w", encoding="utf-8") as f:
+                    json.dump(self._responses[bucket], f)
+            except (IOError, TypeError) as e:
+                logger.warning("⚠️ Error persisting semantic cache bucket %s: %s", bucket, e)
+
+
+def _normalise(embedding: ta.Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _split_system(system) -> tuple[str, str]:
+    """(static prefix, per-call suffix) of a plain or split system prompt."""
+    if isinstance(system, (tuple, list)):
+        prefix, suffix = system
+        return prefix or "", suffix or ""
+    return system or "", ""
+
+
+def _bucket_key(arguments: dict) -> str:
+    """
+    Everything that must match exactly for a cached response to be reusable: the
+    provider and model, the static system prefix and the options that change what
+    the model can do or return. The per-call system suffix is embedded instead.
+    """
+    payload = {
+        "provider": arguments["provider"],
+        "model": arguments["model"],
+        "system": _split_system(arguments["system"])[0],
+        "extra_messages": arguments["extra_messages"] or [],
+        "tools": arguments["tools"],
+        "enable_web_search": arguments["enable_web_search"],
+        "response_format": arguments["response_format"],
+    }
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+
+def _embedding_text(arguments: dict) -> str:
+    suffix = _split_system(arguments["system"])[1]
+    return f"{suffix}\n\n{arguments['user']}" if suffix else arguments["user"]
+
+
+def semantic_cache(
+        embed: ta.Callable[[str], ta.Sequence[float]],
+        threshold: float | None | ta.Callable[[], float | None],
+        skip_if: ta.Callable[[dict], bool] | None = None,
+        cache: SemanticCache | None = None,
+):
+    """
+    Decorator for `call_llm`-style functions taking `provider`, `model`, `system`, `user`,
+    `extra_messages`, `tools`, `enable_web_search` and `response_format`.
+
+    Args:
+        embed: Function returning an embedding for a piece of text.
+        threshold: Cosine similarity at or above which a cached response is returned.
+                   If None the decorator is a no-op, so the tier is opt-in. May be a
+                   zero-argument callable, resolved once on the first call (e.g. to
+                   read it from the environment after `.env` is loaded).
+        skip_if: Optional predicate over the bound arguments to bypass the cache.
+        cache: Backing store; a process-wide `SemanticCache` by default.
+    """
+    resolve_threshold = functools.cache(threshold) if callable(threshold) else (lambda: threshold)
+
+    def decorator(func):
+        store = cache or SemanticCache()
+        sig = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            min_similarity = resolve_threshold()
+            if min_similarity is None:
+                return func(*args, **kwargs)
+
+            bound_args = sig.bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            arguments = bound_args.arguments
+            if skip_if is not None and skip_if(arguments):
+                return func(*args, **kwargs)
+
+            bucket = _bucket_key(arguments)
+
+            try:
+                vector = _normalise(embed(_embedding_text(arguments)))
+            except Exception as e:
+                logger.warning("⚠️ Embedding failed, skipping semantic cache: %s", e)
+                return func(*args, **kwargs)
+
+            cached = store.lookup(bucket, vector, min_similarity)
+            if cached is not None:
+                return cached
+
+            result = func(*args, **kwargs)
+            if result:
+                store.add(bucket, vector, result)
+            return result
+        return wrapper
+    return decorator
@@ -1,68 +1,90 @@
 import os
-import dateutil.parser
+import functools
+import httpx
 import logging
 import typing as t
 from dotenv import load_dotenv
-from supabase import create_client
-from datetime import date, time, datetime, timezone
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 from newsletter.types import Event
 
-load_dotenv()
+if t.TYPE_CHECKING:
+    from supabase import Client
+
 logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-logger.info(f"Supabase URL: {SUPABASE_URL}")
-if SUPABASE_KEY:
-    logger.info(f"Supabase Key (partial): {SUPABASE_KEY[:5]}...")
+def _supabase_credentials() -> tuple[str | None, str | None]:
+    load_dotenv()
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    logger.info(f"Supabase URL: {url}")
+    if key:
+        logger.info(f"Supabase Key (partial): {key[:5]}...")
+    return url, key
+
+
+# One long-lived pool per client: keep-alive skips per-request TCP/TLS handshakes and
+# HTTP/2 multiplexes concurrent requests, while staying well under Supabase's connection cap.
+SUPABASE_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=40)
+SUPABASE_HTTP_TIMEOUT = 30
+
+
+@functools.lru_cache(maxsize=None)
+def get_supabase() -> "Client":
+    """Create the Supabase client on first use (the SDK is only imported then)."""
+    from supabase import ClientOptions, create_client
 
-# Create the Supabase client once at import time
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    http_client = httpx.Client(http2=True, limits=SUPABASE_HTTP_LIMITS, timeout=SUPABASE_HTTP_TIMEOUT)
+    return create_client(*_supabase_credentials(), options=ClientOptions(httpx_client=http_client))
+
+
+# Message-IDs are long once URL-encoded, so keep `in.(...)` filters well under URL limits
+IN_FILTER_CHUNK_SIZE = 100
+
+# Rows per bulk insert/upsert request, to bound request body size
+BULK_WRITE_CHUNK_SIZE = 500
 
 
 # ---------- helpers -----------------------------------------------------------
 
-def _date_to_iso(d: date | None) -> str | None:
-    return d.isoformat() if d else None
+def _chunks(items: t.Sequence[t.Any], size: int) -> t.Iterator[t.Sequence[t.Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 
-def _time_to_str(t: time | None) -> str | None:
-    return t.isoformat(timespec="seconds") if t else None
+def _existing_ids(table: str, column: str, ids: t.Iterable[str]) -> set[str]:
+    """Return the subset of `ids` present in `table.column`, one query per chunk."""
+    found: set[str] = set()
+    for chunk in _chunks(list(dict.fromkeys(ids)), IN_FILTER_CHUNK_SIZE):
+        res = get_supabase().table(table).select(column).in_(column, list(chunk)).execute()
+        found.update(r[column] for r in (res.data or []))
+    return found
 
 
-def email_already_parsed(message_id: str) -> bool:
-    res_1 = (
-        supabase.table("events")
-        .select("id")
-        .eq("email_message_id", message_id)
-        .limit(1)
-        .execute()
-    )
-    if bool(res_1.data):
-        return True
+def fetch_existing_message_ids(ids: t.Iterable[str]) -> set[str]:
+    """
+    Return the message_ids from `ids` that are already stored in `emails`.
+    """
+    return _existing_ids("emails", "message_id", ids)
 
-    res_2 = (
-        supabase.table("emails_processed")
-        .select("message_id")
-        .eq("message_id", message_id)
-        .limit(1)
-        .execute()
-    )
-    if bool(res_2.data):
-        return True
-    return False
 
+def filter_new_message_ids(ids: t.Iterable[str]) -> set[str]:
+    """
+    Return the message_ids from `ids` that are not yet stored in `emails`.
+    """
+    ids = set(ids)
+    return ids - fetch_existing_message_ids(ids)
 
-def fetch_all_emails() -> t.List[t.Dict[str, t.Any]]:
-    """Fetch every stored email (add filters/pagination in prod)."""
-    try:
-        res = supabase.table("emails").select("*").execute()
-        return res.data or []
-    except Exception as exc:
-        logger.error("Failed to fetch emails: %s", exc)
-        return []
+
+def load_parsed_index(ids: t.Iterable[str]) -> frozenset[str]:
+    """
+    Return the message_ids from `ids` that already have events or an emails_processed row.
+    """
+    ids = set(ids)
+    parsed = _existing_ids("events", "email_message_id", ids)
+    parsed |= _existing_ids("emails_processed", "message_id", ids - parsed)
+    return frozenset(parsed)
 
 
 # ---------- event persistence -------------------------------------------------
@@ -75,62 +97,54 @@ def _datetime_to_iso(dt: datetime | None) -> str | None:
     return dt.isoformat()
 
 
-def save_events_to_db(events: list[Event], email_message_id: str) -> None:
-    """
-    Insert a batch of events into `events` iff the email hasn’t been parsed.
-    """
-    if not events:
-        return
-
-    if email_already_parsed(email_message_id):
-        logger.info("Events for %s already in DB – skipping insert.", email_message_id)
-        return
-
-    rows: list[dict[str, t.Any]] = []
-    for ev in events:
-        rec = ev.dict()
-
-        # --- SERIALISE new date/time columns -----------------------
-        rec["start_date"] = _date_to_iso(rec["start_date"])
-        rec["end_date"] = _date_to_iso(rec["end_date"])
-        rec["start_time"] = _time_to_str(rec["start_time"])
-        rec["end_time"] = _time_to_str(rec["end_time"])
-
-        rec["email_message_id"] = email_message_id
-        rows.append(rec)
+def _event_rows(events: list[Event], email_message_id: str) -> list[dict[str, t.Any]]:
+    # mode="json" already renders dates/times as ISO strings and enums as their values.
+    # None fields are dropped to shrink the payload; the RPC writes them as NULL.
+    return [
+        {**ev.model_dump(mode="json", exclude_none=True), "email_message_id": email_message_id}
+        for ev in events
+    ]
 
-    supabase.table("events").insert(rows).execute()
-    logger.info("Inserted %s events for %s", len(rows), email_message_id)
 
-
-def email_exists(message_id: str) -> bool:
+def save_events_and_mark(
+        events: list[Event],
+        email_message_id: str,
+        parsed_ok: bool = True,
+        note: str | None = None,
+) -> int:
     """
-    Returns True if an email with the given message_id is already stored in the database.
+    Insert an email's events and upsert its emails_processed row atomically in one
+    round-trip (see the `save_events_and_mark` SQL function). Events are skipped
+    server-side if the email already has some. Returns the number inserted.
     """
+    res = get_supabase().rpc("save_events_and_mark", {
+        "mid": email_message_id,
+        "evs": _event_rows(events, email_message_id),
+        "parsed_ok": parsed_ok,
+        "note": note,
+    }).execute()
+    inserted = res.data or 0
+    logger.info("Inserted %s events for %s and marked it processed", inserted, email_message_id)
+    return inserted
+
+
+def _parse_email_date(raw: str) -> datetime:
+    # Gmail `Date:` headers are RFC 5322, which the stdlib parses far faster than dateutil
     try:
-        result = (
-            supabase.table("emails")
-            .select("message_id")
-            .eq("message_id", message_id)
-            .execute()
-        )
-        return len(result.data) > 0
-    except Exception as e:
-        logger.error(f"Error checking email existence for {message_id}: {e}")
-        # On error, default to False so we do not skip a potentially valid email.
-        return False
+        return parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        import dateutil.parser
 
+        return dateutil.parser.parse(raw)
 
-def save_email(email_data: t.Dict[str, t.Any]) -> None:
-    """
-    Saves the given email data to the Supabase 'emails' table.
-    """
+
+def _email_row(email_data: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
     date = email_data["date"]
     if date:
-        date = dateutil.parser.parse(date)
+        date = _parse_email_date(date)
         date = date.isoformat()  # e.g. '2025-03-10T20:58:24+01:00'
 
-    data = {
+    return {
         "message_id": email_data["message_id"],
         "sender": email_data["sender"],
         "subject": email_data["subject"],
@@ -142,8 +156,63 @@ def save_email(email_data: t.Dict[str, t.Any]) -> None:
         "newsletter_source_type": email_data["newsletter_source_type"],
     }
 
-    supabase.table("emails").insert(data).execute()
-    logger.info(f"Stored email {data['message_id']} in Supabase.")
+
+def save_emails_bulk(emails: t.List[t.Dict[str, t.Any]]) -> None:
+    """
+    Upserts many emails into the Supabase 'emails' table, one round-trip per
+    BULK_WRITE_CHUNK_SIZE rows. Re-saving an existing message_id updates the row
+    instead of failing.
+    """
+    if not emails:
+        return
+
+    rows = [_email_row(email_data) for email_data in emails]
+    for chunk in _chunks(rows, BULK_WRITE_CHUNK_SIZE):
+        get_supabase().table("emails").upsert(list(chunk), on_conflict="message_id").execute()
+    logger.info(f"Stored {len(rows)} emails in Supabase.")
+
+
+def get_gmail_history_id(account: str = "me") -> str | None:
+    """
+    Return the Gmail historyId saved after the last successful ingest, if any.
+    """
+    res = get_supabase().table("gmail_state").select("history_id").eq("account", account).limit(1).execute()
+    return res.data[0]["history_id"] if res.data else None
+
+
+def save_gmail_history_id(history_id: str, account: str = "me") -> None:
+    row = {
+        "account": account,
+        "history_id": history_id,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    get_supabase().table("gmail_state").upsert(row, on_conflict="account").execute()
+
+
+def fetch_cached_classifications(body_hashes: t.Iterable[str]) -> dict[str, bool]:
+    """
+    Return `{body_hash: is_newsletter}` for the hashes already classified, one
+    query per IN_FILTER_CHUNK_SIZE hashes.
+    """
+    found: dict[str, bool] = {}
+    for chunk in _chunks(list(dict.fromkeys(body_hashes)), IN_FILTER_CHUNK_SIZE):
+        res = (
+            get_supabase().table("classification_cache")
+            .select("body_hash, is_newsletter")
+            .in_("body_hash", list(chunk))
+            .execute()
+        )
+        found.update((r["body_hash"], r["is_newsletter"]) for r in (res.data or []))
+    return found
+
+
+def save_classifications(classifications: dict[str, bool]) -> None:
+    rows = [
+        {"body_hash": body_hash, "is_newsletter": is_newsletter}
+        for body_hash, is_newsletter in classifications.items()
+    ]
+    for chunk in _chunks(rows, BULK_WRITE_CHUNK_SIZE):
+        get_supabase().table("classification_cache").upsert(list(chunk), on_conflict="body_hash").execute()
 
 
 def email_already_processed(message_id: str) -> bool:
@@ -151,7 +220,7 @@ def email_already_processed(message_id: str) -> bool:
     True ⇢ row exists in emails_processed.
     """
     res = (
-        supabase.table("emails_processed")
+        get_supabase().table("emails_processed")
         .select("message_id")
         .eq("message_id", message_id)
         .limit(1)
@@ -166,24 +235,79 @@ def mark_email_processed(message_id: str, parsed_ok: bool, note: str | None = No
     """
     row = {
         "message_id": message_id,
-        "processed_at": datetime.utcnow().isoformat(),
+        "processed_at": datetime.now(timezone.utc).isoformat(),
         "parsed_ok": parsed_ok,
         "note": note,
     }
-    supabase.table("emails_processed").upsert(row).execute()
+    get_supabase().table("emails_processed").upsert(row).execute()
 
 
-def fetch_unprocessed_emails(batch_size: int) -> list[dict]:
+def mark_emails_processed_bulk(items: t.Sequence[tuple[str, bool, str | None]]) -> None:
     """
-    Return up to `batch_size` emails that have **no** row in emails_processed.
+    Upsert many `(message_id, parsed_ok, note)` rows, stamped with one shared
+    processed_at, one round-trip per BULK_WRITE_CHUNK_SIZE rows.
     """
-    # grab processed ids only once (tiny table)
-    res = supabase.table("emails_processed").select("message_id").execute()
-    done = {r["message_id"] for r in (res.data or [])}
+    if not items:
+        return
+
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [
+        {"message_id": message_id, "processed_at": now, "parsed_ok": parsed_ok, "note": note}
+        for message_id, parsed_ok, note in items
+    ]
+    for chunk in _chunks(rows, BULK_WRITE_CHUNK_SIZE):
+        get_supabase().table("emails_processed").upsert(list(chunk), on_conflict="message_id").execute()
+    logger.info(f"Marked {len(rows)} emails as processed.")
+
+
+# Unprocessed emails are streamed a page at a time, so a large backlog of bodies
+# is never held in memory all at once
+UNPROCESSED_PAGE_SIZE = 100
 
-    q = supabase.table("emails").select("*")
-    if batch_size:
-        q = q.limit(batch_size)
 
-    emails = q.execute().data or []
-    return [e for e in emails if e["message_id"] not in done]
+def mark_skipped_emails(max_body_chars: int) -> int:
+    """
+    Mark every unprocessed email that is over `max_body_chars` or not a newsletter
+    as processed (parsed_ok=False, note "body_too_large" / "not_newsletter") in a
+    single statement, without fetching any bodies. Returns the number marked.
+    """
+    res = get_supabase().rpc("mark_skipped_emails", {"max_body_chars": max_body_chars}).execute()
+    marked = res.data or 0
+    logger.info(f"Marked {marked} oversized or non-newsletter emails as processed.")
+    return marked
+
+
+def fetch_unprocessed_emails(
+        batch_size: int,
+        page_size: int = UNPROCESSED_PAGE_SIZE,
+        max_body_chars: int | None = None,
+        newsletters_only: bool = False,
+) -> t.Iterator[list[dict]]:
+    """
+    Yield up to `batch_size` emails that have **no** row in emails_processed, one
+    page (query) at a time. The anti-join runs in Postgres (see supabase/migrations),
+    so the limit applies to unprocessed rows only and processed ids never cross the
+    wire. Pages are keyed on message_id, so marking emails processed while iterating
+    doesn't make later pages skip rows.
+
+    `max_body_chars` and `newsletters_only` are applied in the same query, so rows
+    the caller would discard are never downloaded.
+    """
+    remaining = batch_size or None
+    after_id = None
+    while remaining is None or remaining > 0:
+        limit = page_size if remaining is None else min(page_size, remaining)
+        res = get_supabase().rpc("get_unprocessed_emails", {
+            "batch": limit,
+            "after_id": after_id,
+            "max_body_chars": max_body_chars,
+            "newsletters_only": newsletters_only,
+        }).execute()
+        rows = res.data or []
+        if rows:
+            yield rows
+        if len(rows) < limit:
+            return
+        after_id = rows[-1]["message_id"]
+        if remaining is not None:
+            remaining -= len(rows)
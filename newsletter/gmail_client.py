@@ -1,20 +1,48 @@
 import os
 import base64
 import logging
+import time
 import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from email import message_from_bytes
 from email.message import Message
 
+import httplib2
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 logger = logging.getLogger(__name__)
 
 # For read-only access to Gmail
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
+# Sub-requests per batched HTTP call; Gmail caps batches at 100 and recommends
+# staying at or below 50 to avoid per-user rate limiting.
+GMAIL_BATCH_SIZE = 50
+
+# Failed sub-requests are re-issued up to this many times, backing off exponentially
+GMAIL_BATCH_MAX_RETRIES = 5
+GMAIL_BATCH_RETRY_BASE_SECONDS = 1.0
+GMAIL_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+def _is_retryable(exception: Exception) -> bool:
+    """Rate limiting (429, or 403 with a rate-limit reason) and 5xx errors are transient."""
+    if not isinstance(exception, HttpError):
+        return False
+    status = exception.resp.status
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and any(reason in str(exception.content) for reason in GMAIL_RATE_LIMIT_REASONS)
+
+
+def _is_not_found(exception: Exception) -> bool:
+    return isinstance(exception, HttpError) and exception.resp.status == 404
+
 
 def load_credentials(token_path: str, scopes: t.List[str]) -> Credentials:
     """
@@ -66,37 +94,203 @@ class GmailClient:
         Fetches all messages from Gmail matching the optional 'query'.
         Returns them as a list of 'email.message.Message' objects.
         """
-        messages: t.List[Message] = []
+        return self._fetch_pages(query, max_results, self._get_raw_messages)
+
+    def fetch_message_ids(
+            self,
+            query: t.Optional[str] = None,
+            max_results: int = 100
+    ) -> t.Dict[str, t.Optional[str]]:
+        """
+        Lightweight listing for dedup: maps each matching Gmail id to its Message-ID
+        header using `format="metadata"`, so no bodies are downloaded. Pair with
+        `get_messages` to fetch full messages only for the ids still needed.
+        """
+        return dict(self._fetch_pages(query, max_results, self._get_message_id_headers))
+
+    def get_history_id(self) -> str:
+        """
+        Returns the mailbox's current historyId (a cursor for `fetch_message_ids_since`).
+        """
+        return str(self.service.users().getProfile(userId="me").execute()["historyId"])
+
+    def fetch_message_ids_since(self, history_id: str) -> t.Optional[t.Dict[str, t.Optional[str]]]:
+        """
+        Like `fetch_message_ids`, but only for messages added to the inbox since
+        `history_id`, via `users.history.list` (O(new messages) instead of re-listing
+        a date range). Messages deleted since they were added are skipped. Returns None
+        if the cursor is too old for Gmail to serve, so callers can fall back to a full query.
+        """
+        gmail_ids: t.Dict[str, None] = {}
         page_token = None
+        try:
+            while True:
+                list_args = {
+                    "userId": "me",
+                    "startHistoryId": history_id,
+                    "historyTypes": ["messageAdded"],
+                    # Like the date query: no drafts, sent mail or spam
+                    "labelId": "INBOX",
+                }
+                if page_token:
+                    list_args["pageToken"] = page_token
+
+                response = self.service.users().history().list(**list_args).execute()
+                for record in response.get("history", []):
+                    for added in record.get("messagesAdded", []):
+                        gmail_ids[added["message"]["id"]] = None
+
+                page_token = response.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as e:
+            if e.resp.status == 404:
+                logger.warning(f"Gmail historyId {history_id} has expired; a full fetch is needed.")
+                return None
+            raise
+
+        return dict(self._get_message_id_headers(list(gmail_ids), skip_missing=True))
+
+    def get_messages(self, gmail_ids: t.List[str]) -> t.List[Message]:
+        """
+        Fetches the full (raw) messages for the given Gmail ids, in order.
+        """
+        return self._get_raw_messages(gmail_ids)
 
-        while True:
-            list_args = {
-                "userId": "me",
-                "maxResults": max_results,
-            }
-            if query:
-                list_args["q"] = query
-            if page_token:
-                list_args["pageToken"] = page_token
-
-            response = self.service.users().messages().list(**list_args).execute()
-            raw_messages = response.get("messages", [])
-
-            for msg_info in raw_messages:
-                msg_id = msg_info["id"]
-                # Retrieve the raw email
-                detail = self.service.users().messages().get(
-                    userId="me", id=msg_id, format="raw"
-                ).execute()
-                msg_bytes = base64.urlsafe_b64decode(detail["raw"])
-                msg_obj = message_from_bytes(msg_bytes)
-                messages.append(msg_obj)
-
-            page_token = response.get("nextPageToken")
-            if not page_token:
+    def iter_messages(self, gmail_ids: t.List[str]) -> t.Iterator[t.List[Message]]:
+        """
+        Like `get_messages`, but yields the messages one GMAIL_BATCH_SIZE page at a time
+        so callers can start on the first page before the rest are downloaded. The next
+        page is fetched on a background thread while the caller works on the current
+        one, so memory holds a few pages of bodies rather than the whole list.
+        """
+        # httplib2 connections aren't thread-safe, so the fetch thread gets its own
+        fetch_http = AuthorizedHttp(self.creds, http=httplib2.Http())
+        with ThreadPoolExecutor(max_workers=1) as fetch_pool:
+            pending: Future | None = None
+            for start in range(0, len(gmail_ids), GMAIL_BATCH_SIZE):
+                page = fetch_pool.submit(self._get_raw_messages, gmail_ids[start:start + GMAIL_BATCH_SIZE], fetch_http)
+                if pending is not None:
+                    yield pending.result()
+                pending = page
+            if pending is not None:
+                yield pending.result()
+
+    def _fetch_pages(
+            self,
+            query: t.Optional[str],
+            max_results: int,
+            fetch_page: t.Callable[[t.List[str], t.Any], t.List[t.Any]],
+    ) -> t.List[t.Any]:
+        """
+        Lists message ids page by page and runs `fetch_page(ids, http)` for each page.
+        Page N is fetched on a background thread while page N+1 is listed, so listing
+        latency overlaps with message retrieval.
+        """
+        pages: t.List[Future] = []
+        page_token = None
+
+        # httplib2 connections aren't thread-safe, so the fetch thread gets its own
+        fetch_http = AuthorizedHttp(self.creds, http=httplib2.Http())
+        with ThreadPoolExecutor(max_workers=1) as fetch_pool:
+            while True:
+                list_args = {
+                    "userId": "me",
+                    "maxResults": max_results,
+                }
+                if query:
+                    list_args["q"] = query
+                if page_token:
+                    list_args["pageToken"] = page_token
+
+                response = self.service.users().messages().list(**list_args).execute()
+                raw_messages = response.get("messages", [])
+                pages.append(fetch_pool.submit(fetch_page, [m["id"] for m in raw_messages], fetch_http))
+
+                page_token = response.get("nextPageToken")
+                if not page_token:
+                    break
+
+        return [item for page in pages for item in page.result()]
+
+    def _batch_get(
+            self,
+            msg_ids: t.List[str],
+            http: t.Any = None,
+            skip_missing: bool = False,
+            **get_args: t.Any,
+    ) -> t.List[t.Dict[str, t.Any]]:
+        """
+        Runs `messages.get(**get_args)` for `msg_ids`, GMAIL_BATCH_SIZE per HTTP round
+        trip, returning the responses in the order of `msg_ids`. Only the ids whose
+        sub-request hit a retryable error (rate limit / server error) are re-issued,
+        with exponential backoff; any other failure is raised. With `skip_missing`,
+        messages that no longer exist (404) are left out instead.
+        """
+        fetched: t.Dict[str, t.Dict[str, t.Any]] = {}
+        failed: t.Dict[str, Exception] = {}
+
+        def _on_response(request_id: str, response: t.Dict[str, t.Any], exception: Exception | None) -> None:
+            if exception is not None:
+                failed[request_id] = exception
+                return
+            fetched[request_id] = response
+
+        pending = list(msg_ids)
+        for attempt in range(GMAIL_BATCH_MAX_RETRIES + 1):
+            if attempt:
+                delay = GMAIL_BATCH_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                logger.warning(f"Retrying {len(pending)} Gmail fetches in {delay:.0f}s (attempt {attempt})")
+                time.sleep(delay)
+            failed.clear()
+            for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=_on_response)
+                for msg_id in pending[start:start + GMAIL_BATCH_SIZE]:
+                    batch.add(
+                        self.service.users().messages().get(userId="me", id=msg_id, **get_args),
+                        request_id=msg_id,
+                    )
+                batch.execute(http=http)
+            if skip_missing:
+                for msg_id in [m for m, e in failed.items() if _is_not_found(e)]:
+                    logger.info(f"Message {msg_id} no longer exists; skipping.")
+                    del failed[msg_id]
+            if not failed:
                 break
+            for msg_id, exception in failed.items():
+                if not _is_retryable(exception):
+                    logger.error(f"Failed to fetch message {msg_id}: {exception}")
+                    raise exception
+            pending = list(failed)
+        else:
+            msg_id, exception = next(iter(failed.items()))
+            logger.error(f"Giving up on {len(failed)} Gmail fetches, e.g. {msg_id}: {exception}")
+            raise exception
+
+        return [fetched[msg_id] for msg_id in msg_ids if msg_id in fetched]
 
-        return messages
+    def _get_raw_messages(self, msg_ids: t.List[str], http: t.Any = None) -> t.List[Message]:
+        return [
+            message_from_bytes(base64.urlsafe_b64decode(response["raw"]))
+            for response in self._batch_get(msg_ids, http, format="raw")
+        ]
+
+    def _get_message_id_headers(
+            self,
+            msg_ids: t.List[str],
+            http: t.Any = None,
+            skip_missing: bool = False,
+    ) -> t.List[t.Tuple[str, t.Optional[str]]]:
+        responses = self._batch_get(
+            msg_ids, http, skip_missing=skip_missing, format="metadata", metadataHeaders=["Message-ID"]
+        )
+        return [
+            (response["id"], next(
+                (h["value"] for h in response.get("payload", {}).get("headers", []) if h["name"].lower() == "message-id"),
+                None,
+            ))
+            for response in responses
+        ]
 
     @staticmethod
     def extract_email_body(email_msg: Message) -> str:
@@ -105,12 +299,20 @@ class GmailClient:
         Skips attachments and HTML parts, returning only text/plain if available.
         """
         if email_msg.is_multipart():
-            for part in email_msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition", "")).lower()
+            # Depth-first in document order (same pick as walk()), descending only into
+            # multipart containers; non-matching leaves are never decoded.
+            stack = [email_msg]
+            while stack:
+                part = stack.pop()
+                if part.is_multipart():
+                    stack.extend(reversed(part.get_payload()))
+                    continue
 
                 # We only care about plain text that's not an attachment
-                if content_type == "text/plain" and "attachment" not in content_disposition:
+                if part.get_content_type() != "text/plain":
+                    continue
+                content_disposition = str(part.get("Content-Disposition", "")).lower()
+                if "attachment" not in content_disposition:
                     payload = part.get_payload(decode=True)
                     return payload.decode("utf-8", "ignore") if payload else "No Content"
 
@@ -1,5 +1,7 @@
 import pytest
+from email.message import Message
 from bs4 import BeautifulSoup
+from newsletter.process import emails
 from newsletter.process.emails import is_html, strip_html, remove_urls
 
 
@@ -64,3 +66,64 @@ def test_strip_html_is_smaller(sample_html):
 )
 def test_remove_urls(input_text, expected_output):
     assert remove_urls(input_text) == expected_output
+
+
+def test_classification_batches_respect_size_and_chars(monkeypatch):
+    monkeypatch.setattr(emails, "CLASSIFY_BATCH_SIZE", 3)
+    monkeypatch.setattr(emails, "CLASSIFY_BATCH_MAX_CHARS", 10)
+    bodies = ["a", "b", "c", "d", "x" * 20, "e"]
+    assert list(emails._classification_batches(bodies)) == [(0, 3), (3, 4), (4, 5), (5, 6)]
+
+
+@pytest.mark.parametrize(
+    "headers, body, expected",
+    [
+        ({}, "Your verification code is 482913", True),  # Short, no dates, no unsubscribe
+        ({}, "Doors open Fri 7:30pm", False),  # Date-like tokens
+        ({"List-Unsubscribe": "<mailto:unsubscribe@example.com>"}, "Hi", False),  # Mailing list
+        ({}, "x" * 600, False),  # Long enough to be worth classifying
+    ],
+)
+def test_obviously_not_newsletter(headers, body, expected):
+    msg = Message()
+    for name, value in headers.items():
+        msg[name] = value
+    assert emails.obviously_not_newsletter(msg, body) is expected
+
+
+@pytest.mark.parametrize(
+    "sender_raw, expected",
+    [
+        ('"Jazz Cafe" <info@jazzcafe.co.uk>', "Jazz Cafe"),  # Plain quoted name
+        ("=?utf-8?q?Caf=C3=A9_Oto?= <news@cafeoto.co.uk>", "Café Oto"),  # Encoded word
+        ("=?utf-8?b?Q2Fmw6k=?= =?iso-8859-1?q?_Ot=F6?= <x@example.com>", "Café Otö"),  # Mixed charsets
+        ("<noreply@example.com>", None),  # No display name
+    ],
+)
+def test_decode_sender_name(sender_raw, expected):
+    assert emails.decode_sender_name(sender_raw) == expected
+
+
+def test_classify_many_uses_precomputed_hashes(monkeypatch):
+    looked_up = []
+
+    def fake_fetch(hashes):
+        looked_up.extend(hashes)
+        return {"h1": True, "h2": False}
+
+    monkeypatch.setattr(emails, "fetch_cached_classifications", fake_fetch)
+    assert emails.classify_many(["a", "b"], ["h1", "h2"]) == [True, False]
+    assert looked_up == ["h1", "h2"]
+
+
+def test_classify_and_save_holds_back_unclassified_rows(monkeypatch):
+    saved = []
+    monkeypatch.setattr(emails, "classify_many", lambda bodies, hashes: [True, None])
+    monkeypatch.setattr(emails, "save_emails_bulk", saved.extend)
+    rows = [
+        {"body": "a", "body_hash": "h1"},
+        {"body": "b", "body_hash": "h2"},
+        {"body": "c", "body_hash": "h3", "is_newsletter": False},
+    ]
+    assert emails._classify_and_save(rows) == 1
+    assert [row["body"] for row in saved] == ["a", "c"]
@@ -0,0 +1,126 @@
+import orjson
+import pytest
+
+from newsletter.process import events
+
+
+def _email(message_id, body="short body", date="2025-06-01T10:00:00+00:00", source="aggregate"):
+    return {"message_id": message_id, "body": body, "date": date, "newsletter_source_type": source}
+
+
+def test_pack_groups_by_date_and_size(monkeypatch):
+    monkeypatch.setattr(events, "PACK_MAX_EMAILS", 2)
+    long_email = _email("long", body="x" * (events.PACK_MAX_EMAIL_CHARS + 1))
+    recs = [
+        _email("a"),
+        long_email,
+        _email("b"),
+        _email("c"),
+        _email("d", date="2025-06-02T09:00:00+00:00"),
+    ]
+    groups = [[e["message_id"] for e in group] for group in events._pack_groups(recs)]
+    assert groups == [["long"], ["a", "b"], ["c"], ["d"]]
+
+
+@pytest.mark.parametrize(
+    "response, expected_events, expected_rerun",
+    [
+        # Every email answered, one of them without events
+        (
+            {"results": [
+                {"email_message_id": "<a@x>", "events": [{"title": "Gig"}]},
+                {"email_message_id": "<b@x>", "events": []},
+            ]},
+            {"<a@x>": [{"title": "Gig"}], "<b@x>": []},
+            [],
+        ),
+        # An email left out of the response is re-run on its own
+        (
+            {"results": [{"email_message_id": "<a@x>", "events": [{"title": "Gig"}]}]},
+            {"<a@x>": [{"title": "Gig"}]},
+            ["<b@x>"],
+        ),
+        # An unknown id means nothing can be attributed with confidence
+        (
+            {"results": [
+                {"email_message_id": "<a@x>", "events": [{"title": "Gig"}]},
+                {"email_message_id": "2", "events": [{"title": "Talk"}]},
+            ]},
+            {},
+            ["<a@x>", "<b@x>"],
+        ),
+        # So does a result without an id, or the old `{"events": [...]}` shape
+        ({"results": [{"events": [{"title": "Gig"}]}]}, {}, ["<a@x>", "<b@x>"]),
+        ({"events": [{"title": "Gig", "email_id": 1}]}, {}, ["<a@x>", "<b@x>"]),
+    ],
+)
+def test_scatter_packed_extraction(response, expected_events, expected_rerun):
+    events_by_id, rerun_ids = events._scatter_packed_extraction(orjson.dumps(response).decode(), ["<a@x>", "<b@x>"])
+    assert events_by_id == expected_events
+    assert rerun_ids == expected_rerun
+
+
+def test_scatter_packed_extraction_malformed():
+    assert events._scatter_packed_extraction("not json", ["<a@x>"]) == ({}, ["<a@x>"])
+
+
+def test_extract_and_save_group_reruns_unattributed_emails(monkeypatch):
+    recs = [_email("<a@x>"), _email("<b@x>"), _email("<c@x>", body="nothing here")]
+    sent = []
+    rerun = []
+    saved = {}
+
+    def fake_prepare(email_body, email_sent_date, message_id, is_aggregator):
+        return None if message_id == "<c@x>" else (email_body, ("system", "context"))
+
+    def fake_call_llm(**request):
+        sent.append(request)
+        return orjson.dumps({"results": [{"email_message_id": "<a@x>", "events": [{"title": "Gig"}]}]}).decode()
+
+    def fake_extract_and_save(email_rec, *providers):
+        rerun.append(email_rec["message_id"])
+        return email_rec["message_id"], True, "no_events_found"
+
+    def fake_save(msg_id, extracted_events):
+        saved[msg_id] = extracted_events
+
+    monkeypatch.setattr(events, "_prepare_extraction", fake_prepare)
+    monkeypatch.setattr(events, "call_llm", fake_call_llm)
+    monkeypatch.setattr(events, "_extract_and_save", fake_extract_and_save)
+    monkeypatch.setattr(events, "_process_extracted_events", lambda extracted_raw_event_list, **kw: extracted_raw_event_list)
+    monkeypatch.setattr(events, "_save_extracted", fake_save)
+
+    rows = events._extract_and_save_group(recs, "openai", "openai", "openai")
+
+    assert len(sent) == 1
+    assert '<email id="<a@x>">' in sent[0]["user"] and '<email id="<b@x>">' in sent[0]["user"]
+    assert '"results"' in sent[0]["system"][0]
+    assert saved == {"<a@x>": [{"title": "Gig"}]}
+    assert rerun == ["<b@x>"]
+    assert rows == [("<c@x>", True, "no_events_found"), ("<b@x>", True, "no_events_found")]
+
+
+@pytest.mark.parametrize(
+    "body, has_hints",
+    [
+        (
+            "Thanks for your order! Order number 48213.\n1 x Tote bag £12.50\n"
+            "Paid with Visa on Wed. You may return items within 30 days.",
+            False,
+        ),
+        (
+            "We'd love your feedback. Our 2-minute survey closes in March, so "
+            "tell us what you think before the sun sets on it!",
+            False,
+        ),
+        (
+            "This week: Late Night Jazz at the Roundhouse, Sat 14th June, doors 7.30pm. "
+            "Free entry before 9pm.",
+            True,
+        ),
+    ],
+    ids=["receipt", "survey", "event"],
+)
+def test_prepare_extraction_skips_emails_without_event_hints(body, has_hints):
+    prepared = events._prepare_extraction(body, "2025-06-01T10:00:00+00:00", "<a@x>", is_aggregator=False)
+    assert (prepared is not None) == has_hints
@@ -1,25 +1,42 @@
+import asyncio
+import functools
+import hashlib
 import logging
-import os
 import re
+import typing as t
 import email.header
-from bs4 import BeautifulSoup
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.message import Message
 from email.utils import parseaddr
 from dateutil import parser
 from urllib.parse import quote
 
-from openai import OpenAI
-from supabase import create_client, Client
+from selectolax.lexbor import LexborHTMLParser
 
+from newsletter.ai.get_ai_response import acall_llm, call_llm
 from newsletter.gmail_client import GmailClient
-from newsletter.database import save_email
+from newsletter.database import (
+    BULK_WRITE_CHUNK_SIZE,
+    fetch_cached_classifications,
+    filter_new_message_ids,
+    get_gmail_history_id,
+    get_supabase,
+    save_classifications,
+    save_emails_bulk,
+    save_gmail_history_id,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Emails are classified in parallel; each worker mostly waits on OpenAI/Supabase
+# round-trips. Kept well below Supabase's connection limits.
+MAX_EMAIL_WORKERS = 16
+
+# Compiled once; these run over every email body
+_NEWLINES_RE = re.compile(r'\n\s*')  # a newline plus any indentation / blank lines after it
+_URL_RE = re.compile(r'https?://\S+')
+_HTML_SIGNATURES_RE = re.compile(r'<!doctype|<html|<head|<body|<p|<div|<span|<table', re.IGNORECASE)
 
 
 def is_html(text: str) -> bool:
@@ -27,47 +44,59 @@ def is_html(text: str) -> bool:
     Naive check to see if the text contains HTML/DOCTYPE tags.
     Returns True if it looks like HTML, False if it looks like plain text.
     """
-    text_lower = text.lower()
-    # Look for any of these signatures that strongly suggest HTML
-    signatures = ["<!doctype", "<html", "<head", "<body", "<p", "<div", "<span", "<table"]
-    return any(sig in text_lower for sig in signatures)
+    # One case-insensitive pass for any signature that strongly suggests HTML
+    return _HTML_SIGNATURES_RE.search(text) is not None
+
+
+# Tags whose contents are never visible text
+_NON_TEXT_TAGS = ["script", "style", "template"]
 
 
 def strip_html(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(separator="#")
-    text = re.sub(r'[\n]+', '\n', text).replace("\n#", "")
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(_NON_TEXT_TAGS)
+    text = tree.text(separator="#")
+    text = _NEWLINES_RE.sub('\n', text).replace("\n#", "")
     return text
 
 
 def remove_urls(text: str) -> str:
-    return re.sub(r'https?:\/\/\S+', '', text, flags=re.MULTILINE).strip()
+    return _URL_RE.sub('', text).strip()
+
 
+# Senders repeat across the inbox, so the same From headers are parsed over and over
+SENDER_CACHE_SIZE = 4096
 
+
+@functools.lru_cache(maxsize=SENDER_CACHE_SIZE)
+def parse_sender(sender_raw: str) -> tuple[str, str]:
+    """Memoized `parseaddr`: `(display_name, email_address)`."""
+    return parseaddr(sender_raw)
+
+
+@functools.lru_cache(maxsize=SENDER_CACHE_SIZE)
 def decode_sender_name(sender_raw: str) -> str:
     """
     Extracts and decodes the sender's name from the raw From field.
     Ensures the result is UTF-8 decoded and free from surrounding quotes.
     """
     # parseaddr splits into display_name, email_address
-    display_name, _ = parseaddr(sender_raw)
+    display_name, _ = parse_sender(sender_raw)
 
     if not display_name:
         return None
 
     # decode_header may return a list of (bytes / string, encoding)
     decoded_parts = email.header.decode_header(display_name)
-    decoded_str = []
-    for part, enc in decoded_parts:
-        if isinstance(part, bytes):
-            enc = enc or "utf-8"
-            decoded_str.append(part.decode(enc, errors="replace"))
-        else:
-            # Already a string
-            decoded_str.append(part)
-
-    # Join together
-    decoded_name = "".join(decoded_str)
+    try:
+        # make_header joins the parts and decodes each run of same-charset bytes once
+        decoded_name = str(email.header.make_header(decoded_parts))
+    except (LookupError, UnicodeDecodeError):
+        # Unknown charset or raw 8-bit bytes: decode part by part, replacing bad bytes
+        decoded_name = "".join(
+            part.decode(enc or "utf-8", errors="replace") if isinstance(part, bytes) else part
+            for part, enc in decoded_parts
+        )
 
     # Remove any surrounding quotes
     decoded_name = decoded_name.replace('"', "").strip()
@@ -75,29 +104,182 @@ def decode_sender_name(sender_raw: str) -> str:
     return decoded_name or None
 
 
-def is_events_newsletter(email_body: str) -> bool:
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            store=True,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an AI that classifies whether an email contains details about upcoming events. "
-                               "If the email contains upcoming events at the venue in question or is obviously an events newsletter, respond only with 'true'. Otherwise, respond only with 'false'.",
-                },
-                {"role": "user", "content": email_body},
-            ],
-            max_tokens=5
-        )
+# ─────────────────── newsletter classification ──────────────────
+# Several bodies go into one request so the round-trip and system prompt are paid
+# once per batch. The character cap (~4 chars/token) keeps a batch of long
+# newsletters well inside the model's 128k-token context window.
+# A yes/no answer per email doesn't need the full model; gpt-4o-mini is far cheaper
+# and faster for it
+CLASSIFY_MODEL = "gpt-4o-mini"
+CLASSIFY_BATCH_SIZE = 20
+CLASSIFY_BATCH_MAX_CHARS = 200_000
+# Only the top (masthead, intro, listings) and bottom (call to action) of an email
+# say whether it is an events newsletter; the middle of a long body is just tokens
+CLASSIFY_HEAD_CHARS = 2000
+CLASSIFY_TAIL_CHARS = 1000
+_CLASSIFICATION_LINE_RE = re.compile(r'^\s*(\d+)\s*:\s*(true|false)\b', re.IGNORECASE | re.MULTILINE)
+
+CLASSIFY_SYSTEM_PROMPT = (
+    "You are an AI that classifies whether emails contain details about upcoming events. "
+    "You will be given several emails, each introduced by a '---EMAIL n---' line. "
+    "An email is 'true' if it contains upcoming events at the venue in question or is obviously "
+    "an events newsletter, otherwise 'false'. "
+    "Respond only with one line per email in the form 'n: true' or 'n: false'."
+)
+
+
+# Batches are classified concurrently; the semaphore caps requests in flight, while
+# pacing under the account's limits and retries on 429s come from `acall_llm`
+MAX_CONCURRENT_CLASSIFICATIONS = 20
+
+
+def _classification_excerpt(body: str) -> str:
+    if len(body) <= CLASSIFY_HEAD_CHARS + CLASSIFY_TAIL_CHARS:
+        return body
+    return f"{body[:CLASSIFY_HEAD_CHARS]}\n[...]\n{body[-CLASSIFY_TAIL_CHARS:]}"
+
+
+def _classification_request(bodies: list[str]) -> dict:
+    user_prompt = "\n".join(
+        f"---EMAIL {idx}---\n{body}" for idx, body in enumerate(bodies, start=1)
+    )
+    return dict(
+        provider="openai",
+        model=CLASSIFY_MODEL,
+        system=CLASSIFY_SYSTEM_PROMPT,
+        user=user_prompt,
+        # "n: false" plus a newline is a handful of tokens per email
+        max_tokens=8 * len(bodies),
+        stage="classification",
+    )
+
+
+def _parse_classifications(content: str, count: int) -> list[bool | None]:
+    """Map 'n: true|false' reply lines back to positions; None where n is missing."""
+    results: list[bool | None] = [None] * count
+    for idx, answer in _CLASSIFICATION_LINE_RE.findall(content):
+        position = int(idx) - 1
+        if 0 <= position < count:
+            results[position] = answer.lower() == "true"
+    return results
 
-        classification = completion.choices[0].message
 
-        return classification.content == "true"
+def classify_batch(bodies: list[str]) -> list[bool]:
+    """
+    Classify several email bodies with a single LLM request.
+    Emails missing from the reply (or a failed request) count as not newsletters.
+    """
+    if not bodies:
+        return []
 
+    bodies = [_classification_excerpt(body) for body in bodies]
+    try:
+        content = call_llm(**_classification_request(bodies)) or ""
     except Exception as exc:
         logger.error(f"Error calling OpenAI for classification: {exc}")
-        return False
+        return [False] * len(bodies)
+
+    return [bool(result) for result in _parse_classifications(content, len(bodies))]
+
+
+async def _aclassify_batch(bodies: list[str], semaphore: asyncio.Semaphore) -> list[bool | None]:
+    """Async `classify_batch`, bounded by `semaphore`."""
+    async with semaphore:
+        try:
+            content = await acall_llm(**_classification_request(bodies)) or ""
+        except Exception as exc:
+            logger.error(f"Error calling OpenAI for classification: {exc}")
+            return [None] * len(bodies)
+
+    return _parse_classifications(content, len(bodies))
+
+
+def _classification_batches(bodies: list[str]) -> t.Iterator[tuple[int, int]]:
+    """
+    Yield `(start, end)` slices of `bodies` capped by CLASSIFY_BATCH_SIZE and
+    CLASSIFY_BATCH_MAX_CHARS (a single oversized body still gets its own batch).
+    """
+    start, chars = 0, 0
+    for end, body in enumerate(bodies):
+        if end > start and (end - start >= CLASSIFY_BATCH_SIZE or chars + len(body) > CLASSIFY_BATCH_MAX_CHARS):
+            yield start, end
+            start, chars = end, 0
+        chars += len(body)
+    if start < len(bodies):
+        yield start, len(bodies)
+
+
+async def aclassify_many(bodies: list[str]) -> list[bool | None]:
+    """
+    Classify any number of bodies, batching them into as few requests as fit and
+    running the batches concurrently. Results are returned in input order, with
+    None for bodies the model gave no answer for (or whose request failed).
+    """
+    truncated = sum(len(body) > CLASSIFY_HEAD_CHARS + CLASSIFY_TAIL_CHARS for body in bodies)
+    if truncated:
+        logger.info(
+            f"✂️ Truncated {truncated} of {len(bodies)} bodies to their first {CLASSIFY_HEAD_CHARS} "
+            f"and last {CLASSIFY_TAIL_CHARS} characters for classification."
+        )
+    bodies = [_classification_excerpt(body) for body in bodies]
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CLASSIFICATIONS)
+    batches = await asyncio.gather(*(
+        _aclassify_batch(bodies[start:end], semaphore)
+        for start, end in _classification_batches(bodies)
+    ))
+    return [result for batch in batches for result in batch]
+
+
+def _body_hash(body: str) -> str:
+    """SHA-256 of the body with whitespace collapsed, so re-sent templates share a key."""
+    normalized = " ".join(body.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def classify_many(bodies: list[str], body_hashes: list[str] | None = None) -> list[bool | None]:
+    """
+    Classify bodies through the `classification_cache` table: identical bodies are
+    sent once and only hashes never seen before reach the LLM (via `aclassify_many`).
+    Pass `body_hashes` (parallel to `bodies`) if they were already computed.
+    Bodies the model gave no answer for (or whose request failed) come back as None.
+    """
+    if not bodies:
+        return []
+
+    hashes = body_hashes if body_hashes is not None else [_body_hash(body) for body in bodies]
+    known = fetch_cached_classifications(hashes)
+    misses = {h: body for h, body in zip(hashes, bodies) if h not in known}
+    logger.info(f"🗂️ Classification cache: {len(bodies) - len(misses)} hit(s), {len(misses)} to classify.")
+
+    if misses:
+        results = asyncio.run(aclassify_many(list(misses.values())))
+        # Unanswered bodies aren't cached, so a later run asks the model again
+        fresh = {h: result for h, result in zip(misses, results) if result is not None}
+        save_classifications(fresh)
+        known.update(fresh)
+    return [known.get(h) for h in hashes]
+
+
+# Cheap pre-filter: short mail with no List-Unsubscribe header and nothing that looks
+# like a day, month or time (receipts, 2FA codes, personal replies) skips the LLM
+PREFILTER_MAX_BODY_CHARS = 500
+_DATE_HINT_RE = re.compile(
+    r'\b(mon|tue|wed|thu|fri|sat|sun|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|\d{1,2}[:/]\d{2})',
+    re.IGNORECASE,
+)
+
+
+def obviously_not_newsletter(email_msg: Message, body: str) -> bool:
+    return (
+        email_msg.get("List-Unsubscribe") is None
+        and len(body) < PREFILTER_MAX_BODY_CHARS
+        and _DATE_HINT_RE.search(body) is None
+    )
+
+
+def is_events_newsletter(email_body: str) -> bool:
+    return classify_batch([email_body])[0]
 
 
 # ─────────────────── sender-type classification ──────────────────
@@ -113,7 +295,7 @@ def classify_source(sender_email: str, sender_name: str) -> str:
 
     # 1. venues
     v_match = (
-        supabase.table("venues")
+        get_supabase().table("venues")
         .select("id")
         .or_(venue_or_conditions)
         .limit(1)
@@ -125,7 +307,7 @@ def classify_source(sender_email: str, sender_name: str) -> str:
 
     # 2. aggregators
     a_match = (
-        supabase.table("aggregators")
+        get_supabase().table("aggregators")
         .select("id")
         .or_(venue_or_conditions)
         .limit(1)
@@ -144,11 +326,81 @@ def format_date_for_gmail_query(iso_date: str) -> str:
     return str(int(dt.timestamp()))
 
 
+def build_email_record(email_msg: Message) -> dict | None:
+    """
+    Turn a fetched Gmail message into an `emails` row (body cleaned and source type
+    filled in, plus a `body_hash` of the cleaned body for the classification cache).
+    `is_newsletter` is only set here for mail the pre-filter rules out;
+    the rest are classified later in batches by `classify_many`.
+    Returns None if it has no Message-ID.
+    """
+    message_id = email_msg.get("Message-ID")
+
+    if not message_id:
+        logger.warning("Email is missing Message-ID; skipping.")
+        return None
+
+    email_body = GmailClient.extract_email_body(email_msg)
+    sender_raw = email_msg.get("From", "unknown")
+    display_name, email_address = parse_sender(str(sender_raw))
+    sender_name = decode_sender_name(str(sender_raw))
+
+    email_data = {
+        "message_id": message_id,
+        "sender": sender_raw,
+        "sender_name": sender_name,
+        "email_address": email_address,
+        "subject": email_msg.get("Subject", "No Subject"),
+        "date": email_msg.get("Date", "unknown"),
+        "body": email_body
+    }
+
+    if is_html(email_body):
+        email_body = strip_html(email_body)
+        email_data['body'] = remove_urls(email_body)
+
+    # Hashed here on the worker threads rather than serially when the chunk is classified
+    email_data["body_hash"] = _body_hash(email_data['body'])
+
+    if obviously_not_newsletter(email_msg, email_data['body']):
+        email_data["is_newsletter"] = False
+
+    email_data["newsletter_source_type"] = classify_source(
+        sender_email=email_address,
+        sender_name=sender_name or ""
+    )
+    return email_data
+
+
+def _classify_and_save(email_rows: list[dict]) -> int:
+    """
+    Classify and store `email_rows`. Rows left unclassified (failed or unanswered
+    request) are not stored, so they stay new and are fetched again next run.
+    Returns how many rows were held back.
+    """
+    # Rows the pre-filter already decided don't need the LLM
+    pending = [row for row in email_rows if "is_newsletter" not in row]
+    logger.info(f"🔎 Pre-filter skipped {len(email_rows) - len(pending)} of {len(email_rows)} emails.")
+    classifications = classify_many(
+        [row["body"] for row in pending],
+        [row["body_hash"] for row in pending],
+    )
+    for row, is_newsletter in zip(pending, classifications):
+        row["is_newsletter"] = is_newsletter
+
+    classified = [row for row in email_rows if row["is_newsletter"] is not None]
+    unclassified = len(email_rows) - len(classified)
+    if unclassified:
+        logger.warning(f"⚠️ {unclassified} emails could not be classified; leaving them for the next run.")
+    save_emails_bulk(classified)
+    return unclassified
+
+
 def main() -> None:
     """
     Main entry point:
       1. Find the latest processed email date.
-      2. Fetch only emails sent after that date.
+      2. Fetch only emails added since the last run (Gmail historyId), else sent after that date.
       3. Skip any Message-ID already processed.
       4. Save new emails into Supabase.
     """
@@ -156,56 +408,60 @@ def main() -> None:
     gmail_client = GmailClient(token_path="token.json")
 
     # 1. Find the latest processed email date
-    date_res = supabase.table("emails").select("processed_at").order("processed_at", desc=True).limit(1).execute()
+    date_res = get_supabase().table("emails").select("processed_at").order("processed_at", desc=True).limit(1).execute()
     latest_processed_date = date_res.data[0]["processed_at"]
     logger.info(f"Latest processed email at: {latest_processed_date}")
     gmail_query = f"after:{format_date_for_gmail_query(latest_processed_date)}"
     gmail_query = f"after:{format_date_for_gmail_query('2025-05-25T01:23:46.284783')}"  # TODO: remove
 
-    # 2. Fetch messages with the constructed query
-    messages = gmail_client.fetch_messages(query=gmail_query)
-
-    # 3. Get all already-processed message_ids
-    processed_emails = supabase.table("emails_processed").select("message_id").execute()
-    processed_ids = {r["message_id"] for r in processed_emails.data or []}
-
-    for email_msg in messages:
-        message_id = email_msg.get("Message-ID")
-
+    # 2. List new messages with headers only (no bodies): incrementally from the saved
+    #    historyId when there is one, else by date query. The cursor is read before
+    #    listing so anything arriving mid-run is picked up next time.
+    next_history_id = gmail_client.get_history_id()
+    saved_history_id = get_gmail_history_id()
+    gmail_to_message_id = (
+        gmail_client.fetch_message_ids_since(saved_history_id) if saved_history_id else None
+    )
+    if gmail_to_message_id is None:
+        gmail_to_message_id = gmail_client.fetch_message_ids(query=gmail_query)
+    for gmail_id, message_id in gmail_to_message_id.items():
         if not message_id:
-            logger.warning("Email is missing Message-ID; skipping.")
-            continue
-
-        if message_id in processed_ids:
-            continue
-
-        email_body = gmail_client.extract_email_body(email_msg)
-        sender_raw = email_msg.get("From", "unknown")
-        _, email_address = parseaddr(str(sender_raw))
-        display_name, email_address = parseaddr(str(sender_raw))
-        sender_name = decode_sender_name(sender_raw)
-
-        email_data = {
-            "message_id": message_id,
-            "sender": sender_raw,
-            "sender_name": sender_name,
-            "email_address": email_address,
-            "subject": email_msg.get("Subject", "No Subject"),
-            "date": email_msg.get("Date", "unknown"),
-            "body": email_body
-        }
-
-        if is_html(email_body):
-            email_body = strip_html(email_body)
-            email_data['body'] = remove_urls(email_body)
-
-        email_data["is_newsletter"] = is_events_newsletter(email_data['body'])
-        email_data["newsletter_source_type"] = classify_source(
-            sender_email=email_address,
-            sender_name=sender_name or ""
-        )
+            logger.warning(f"Email {gmail_id} is missing Message-ID; skipping.")
+
+    # 3. Find which Message-IDs are not stored yet (one batched lookup), then
+    #    stream full messages for only those, a page at a time
+    new_ids = filter_new_message_ids(ids=[m for m in gmail_to_message_id.values() if m])
+    message_pages = gmail_client.iter_messages(
+        [gmail_id for gmail_id, message_id in gmail_to_message_id.items() if message_id in new_ids]
+    )
 
-        save_email(email_data)
+    # 4. Build rows concurrently (each waits on two DB lookups), then classify them
+    #    in batched LLM requests, flushing full chunks as we go so a late failure
+    #    doesn't lose finished work. Each full chunk is classified and saved on a
+    #    writer thread while the next one is being built; at most one chunk is in
+    #    flight, so a slow classifier holds back building instead of piling up rows.
+    new_emails = []
+    unclassified = 0
+    pending_save: Future | None = None
+    with ThreadPoolExecutor(max_workers=MAX_EMAIL_WORKERS) as pool, ThreadPoolExecutor(max_workers=1) as writer:
+        for messages in message_pages:
+            for email_data in pool.map(build_email_record, messages):
+                if email_data is None:
+                    continue
+                new_emails.append(email_data)
+                if len(new_emails) >= BULK_WRITE_CHUNK_SIZE:
+                    if pending_save is not None:
+                        unclassified += pending_save.result()
+                    pending_save = writer.submit(_classify_and_save, new_emails)
+                    new_emails = []
+
+        if pending_save is not None:
+            unclassified += pending_save.result()
+
+    unclassified += _classify_and_save(new_emails)
+    # Held-back emails were listed from the current cursor; advancing it would skip them
+    if not unclassified:
+        save_gmail_history_id(next_history_id)
 
 
 if __name__ == "__main__":
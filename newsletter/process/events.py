@@ -2,27 +2,30 @@
 Parse all stored newsletters → structured Event objects → Supabase.
 """
 
-import json
+import functools
 import logging
-import os
 import re
 import typing as ta
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from datetime import date, datetime
 
+import orjson
 from dotenv import load_dotenv
-from openai import OpenAI
 
+from newsletter.ai.batch import batch_mode_enabled, call_llm_batch
 from newsletter.ai.get_ai_response import call_llm
 from newsletter.ai.constants import MODEL_CONFIGS, PROVIDER_OPENAI
 from newsletter.ai.prompts import (
     construct_web_search_system_prompt,
     construct_event_refinement_system_prompt,
-    construct_extract_events_sys_prompt
+    construct_extract_events_sys_prompt,
+    construct_packed_emails_user_prompt,
 )
 from newsletter.database import (
-    save_events_to_db,
-    email_already_parsed,
-    mark_email_processed, fetch_unprocessed_emails,
+    save_events_and_mark,
+    load_parsed_index,
+    mark_emails_processed_bulk, fetch_unprocessed_emails, mark_skipped_emails,
 )
 from newsletter.types import (
     Event,
@@ -35,9 +38,9 @@ from newsletter.types import (
 )
 from newsletter.utils.utils import (
     trim_aggregator_email_bodies_from_known_sources,
-    replace_json_gates, is_valid_london_postcode, get_postcode_info
+    replace_json_gates, is_valid_london_postcode, get_postcode_info, find_london_postcode
 )
-from newsletter.utils.browser import resolve_links_in_body
+from newsletter.utils.browser import close_browsers, resolve_links_in_body
 from newsletter.utils.caching import disk_cache
 
 # ─────────────────────────── setup ────────────────────────────────
@@ -45,8 +48,6 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 # ───────────── human-readable field descriptions ──────────────────
 FIELD_DESCRIPTIONS: dict[str, str] = {
     # ─── identifiers & core text ─────────────────────────────────────
@@ -102,10 +103,134 @@ FIELD_DESCRIPTIONS: dict[str, str] = {
     "from_aggregator": "comes from aggregate source, boolean"
 }
 FIELDS_TXT = "\n".join(f"{k}: {v}" for k, v in FIELD_DESCRIPTIONS.items())
+# The same fields as a bulleted list, for the web-search prompt
+WEB_SEARCH_FIELDS_TXT = "\n".join(f"*   `{k}`: {v}" for k, v in FIELD_DESCRIPTIONS.items())
+WEB_SEARCH_FIELD_NAMES = tuple(FIELD_DESCRIPTIONS)
+# "MM" -> English month name for web-search queries (locale-independent, unlike %B)
+_MONTH_NAMES = {
+    f"{i:02d}": name for i, name in enumerate((
+        "January", "February", "March", "April", "May", "June",
+        "July", "August", "September", "October", "November", "December",
+    ), start=1)
+}
 
 N_CHARS_MAX = 40000
 
+# Everything before the last "unsubscribe": footers sit at the end, while an early
+# "View in browser | Unsubscribe" header line must not swallow the whole body
+_UNSUBSCRIBE_FOOTER_RE = re.compile(r'^(.*)(?=\bunsubscribe\b)', re.IGNORECASE | re.DOTALL)
+
+# An email with no event word, no day-and-month / weekday-and-day date, no numeric
+# date and no clock time has nothing to extract, so it skips the extraction call
+# altogether. Bare month and weekday names are not hints on their own: "may", "sun"
+# or "wed" turn up in receipts and surveys as often as in listings.
+_MONTH = (
+    r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|'
+    r'sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?'
+)
+_WEEKDAY = r'(?:mon|tue(?:s)?|wed(?:nes)?|thu(?:rs?)?|fri|sat(?:ur)?|sun)(?:day)?\.?'
+_DAY = r'\d{1,2}(?:st|nd|rd|th)?'
+_EVENT_HINTS_RE = re.compile(
+    r'\b(?:event|workshop|screening|gig|tonight|tomorrow|doors|ticket|rsvp|free entry|'
+    rf'{_DAY}\s+(?:of\s+)?{_MONTH}|{_MONTH}\s+{_DAY}|{_WEEKDAY},?\s+{_DAY}|'
+    r'\d{1,2}[/.]\d{1,2}[/.]\d{2,4}|\d{4}-\d{2}-\d{2}|'
+    r'\d{1,2}(?:[:.]\d{2})?\s?[ap]m|\d{1,2}:\d{2})\b',
+    re.IGNORECASE,
+)
+
+
+# Prompt pieces that only depend on the Event model and its enums; built once per
+# process instead of for every email / every refined event
+EXTRACTION_ENUM_MAP = {
+    "EventOccurrenceType": EventOccurrenceType,
+    "EventLocationType": EventLocationType,
+    "EventBookingType": EventBookingType,
+    "EventTargetAudience": EventTargetAudience,
+    "EventType": EventType,
+}
+ENUMS_TXT = "\n".join(
+    f"{n}: {', '.join(e.value for e in enum_cls)}"
+    for n, enum_cls in EXTRACTION_ENUM_MAP.items()
+)
+
+# Valid values for the list fields the LLM fills in, checked for every extracted event
+_ALLOWED_TARGET_AUDIENCES: frozenset[str] = frozenset(e.value for e in EventTargetAudience)
+_ALLOWED_EVENT_TYPES: frozenset[str] = frozenset(e.value for e in EventType)
+
+# Fallbacks for fields the LLM left out or returned as null / empty
+_EVENT_FIELD_DEFAULTS = {
+    "end_date": None,
+    "summary": "",
+    "description_verbatim": "",
+    "time_of_day": "tbc",
+    "occurrence_type": EventOccurrenceType.tbc.value,
+    "location_type": EventLocationType.tbc.value,
+    "parsing_confidence_score": 0.5,
+}
+# (field, allowed values, log label, log emoji) for the enum-list fields
+_ENUM_LIST_FIELDS = (
+    ("target_audiences", _ALLOWED_TARGET_AUDIENCES, "target audiences", "✂️"),
+    ("event_types", _ALLOWED_EVENT_TYPES, "event types", "🏷️"),
+)
+
+# Fields the refinement step must not touch, so they are left out of its schema
+_REFINEMENT_EXCLUDED_FIELDS = (
+    "email_message_id", "from_aggregator", "enrichment_status", "parsing_confidence_score",
+    "description_verbatim", "original_event_text_from_aggregator",
+)
+
+
+# Fields refinement may update; only these (when set) are shown to the model
+_REFINABLE_FIELDS = frozenset(Event.model_fields) - frozenset(_REFINEMENT_EXCLUDED_FIELDS)
 
+
+def _refinement_event_json(event: dict) -> str:
+    """Compact JSON of the event's non-empty refinable fields, for the refinement prompt."""
+    return orjson.dumps({
+        k: v for k, v in event.items()
+        if k in _REFINABLE_FIELDS and v is not None and v != "" and v != []
+    }).decode()
+
+
+@functools.lru_cache(maxsize=None)
+def _extraction_schema_txt() -> str:
+    schema = Event.model_json_schema()
+    schema.pop("title", None)
+    return orjson.dumps(schema).decode()
+
+
+@functools.lru_cache(maxsize=None)
+def _packed_extraction_schema_txt() -> str:
+    """The `{"results": [{"email_message_id", "events"}]}` shape of a packed extraction."""
+    event_schema = Event.model_json_schema()
+    event_schema.pop("title", None)
+    defs = event_schema.pop("$defs", None)
+    schema = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": {
+            "type": "object",
+            "properties": {
+                "email_message_id": {"type": "string"},
+                "events": {"type": "array", "items": event_schema},
+            },
+            "required": ["email_message_id", "events"],
+        }}},
+        "required": ["results"],
+    }
+    if defs:
+        schema["$defs"] = defs
+    return orjson.dumps(schema).decode()
+
+
+@functools.lru_cache(maxsize=None)
+def _refinement_schema_context() -> str:
+    event_schema_properties = Event.model_json_schema().get("properties", {})
+    for key_to_remove in _REFINEMENT_EXCLUDED_FIELDS:
+        event_schema_properties.pop(key_to_remove, None)
+    return orjson.dumps(event_schema_properties, option=orjson.OPT_INDENT_2).decode()
+
+
+@functools.lru_cache(maxsize=None)
 def _get_relevant_enums_for_refinement() -> str:
     """Helper to get enum definitions relevant for the refinement step."""
     # Enums most likely to be affected/informed by web search
@@ -131,13 +256,14 @@ def _get_web_search_summary(event_dict_to_enrich: dict, provider_for_search: str
     start_date_str = event_dict_to_enrich.get('start_date')
 
     if not title or not start_date_str:
-        logger.warning(msg="⚠️ Title or start_date missing, cannot perform web search.")
+        logger.warning("⚠️ Title or start_date missing, cannot perform web search.")
         return None
 
     try:
-        dt_object = datetime.strptime(start_date_str, '%Y-%m-%d')
-        formatted_start_date = dt_object.strftime(format='%B %d, %Y')
-    except (ValueError, TypeError):
+        # Same text as strftime('%B %d, %Y'), without a parse/format round-trip
+        year, month, day = start_date_str.split('-')
+        formatted_start_date = f"{_MONTH_NAMES[month]} {day}, {year}"
+    except (ValueError, KeyError, AttributeError):
         formatted_start_date = start_date_str
 
     query = f"{title} {formatted_start_date}"
@@ -146,13 +272,7 @@ def _get_web_search_summary(event_dict_to_enrich: dict, provider_for_search: str
     if event_dict_to_enrich.get("location_neighbourhood"):
         query += f" {event_dict_to_enrich['location_neighbourhood']}"
 
-    logger.info(msg=f"🌐 Web search query for '{title}': {query}")
-
-    fields_to_retrieve_txt = "\n".join([
-        f"*   `{key}`: {description}"
-        for key, description in FIELD_DESCRIPTIONS.items()
-    ])
-    field_names_for_example = list(FIELD_DESCRIPTIONS.keys())
+    logger.info("🌐 Web search query for '%s': %s", title, query)
 
     current_event_info_lines = []
     for key, value in event_dict_to_enrich.items():
@@ -163,13 +283,13 @@ def _get_web_search_summary(event_dict_to_enrich: dict, provider_for_search: str
         current_event_info_txt = "No pre-existing information available for this event."
 
     system_prompt_for_search = construct_web_search_system_prompt(
-        fields_to_retrieve_txt=fields_to_retrieve_txt,
-        field_names_for_example=field_names_for_example,
+        fields_to_retrieve_txt=WEB_SEARCH_FIELDS_TXT,
+        field_names_for_example=WEB_SEARCH_FIELD_NAMES,
         current_event_info_txt=current_event_info_txt
     )
 
     if provider_for_search not in MODEL_CONFIGS or "web_search_details" not in MODEL_CONFIGS[provider_for_search]:
-        logger.error(msg=f"🛑 Web search details not configured for provider: {provider_for_search}")
+        logger.error("🛑 Web search details not configured for provider: %s", provider_for_search)
         return None
 
     web_search_config = MODEL_CONFIGS[provider_for_search]["web_search_details"]
@@ -182,17 +302,19 @@ def _get_web_search_summary(event_dict_to_enrich: dict, provider_for_search: str
         system=system_prompt_for_search,
         user=query,
         enable_web_search=True,
+        stage="web_search",
         max_tokens=16_384,
         web_search_options=current_web_search_options,
+        use_semantic_cache=True,
     )
 
     web_search_summary_processed = replace_json_gates(s=web_search_summary_result)
 
     if not web_search_summary_processed or web_search_summary_processed.strip() == "":
-        logger.info(msg=f"💨 Web search for query:['{query}'] yielded no content.")
+        logger.info("💨 Web search for query:['%s'] yielded no content.", query)
         return None
 
-    logger.info(msg=f"📄 Web search summary for '{title}': {web_search_summary_processed[:500]}...")
+    logger.info("📄 Web search summary for '%s': %.500s...", title, web_search_summary_processed)
     return web_search_summary_processed
 
 
@@ -207,20 +329,12 @@ def _refine_event_with_web_summary(
     Results are cached to disk via decorator.
     """
     title = event['title']
-    event_schema_properties = Event.model_json_schema().get("properties", {})
-    for key_to_remove in ["email_message_id", "from_aggregator", "enrichment_status", "parsing_confidence_score",
-                          "description_verbatim", "original_event_text_from_aggregator"]:
-        event_schema_properties.pop(key_to_remove, None)
-
-    refinement_schema_context = json.dumps(obj=event_schema_properties, indent=2)
-    relevant_enums_txt = _get_relevant_enums_for_refinement()
-
     refinement_system_prompt = construct_event_refinement_system_prompt(
-        refinement_schema_context=refinement_schema_context,
-        relevant_enums_txt=relevant_enums_txt
+        refinement_schema_context=_refinement_schema_context(),
+        relevant_enums_txt=_get_relevant_enums_for_refinement()
     )
 
-    refine_user_content = f"Current Event JSON:```{json.dumps(obj=event, indent=2)}```\n\nWeb Search Summary:```{web_search_summary}```"
+    refine_user_content = f"Current Event JSON:```{_refinement_event_json(event)}```\n\nWeb Search Summary:```{web_search_summary}```"
 
     provider_config = MODEL_CONFIGS[provider_for_refinement]
     refinement_model = provider_config['model']
@@ -232,104 +346,168 @@ def _refine_event_with_web_summary(
         system=refinement_system_prompt,
         user=refine_user_content,
         response_format=refinement_response_format,
-        temperature=0.1
+        temperature=0.1,
+        stage="refinement",
+        use_semantic_cache=True,
     )
-    refined_data = json.loads(s=refined_data_str)
+    refined_data = orjson.loads(refined_data_str)
 
     if refined_data:
-        logger.info(msg=f"📬  Refinement for '{title}' suggested updates: {refined_data}")
+        logger.info("📬  Refinement for '%s' suggested updates: %s", title, refined_data)
     else:
-        logger.info(msg=f"🫗  Refinement for '{title}' suggested no changes.")
+        logger.info("🫗  Refinement for '%s' suggested no changes.", title)
     return refined_data
 
 
+def _event_identity(ev: dict) -> tuple[str, str, str | None] | None:
+    """
+    Normalised (title, start_date, event_url or organizer) key under which the same
+    event relisted by several emails is recognised; None if title or date is missing.
+    """
+    title, start_date = ev.get("title"), ev.get("start_date")
+    if not title or not start_date:
+        return None
+    return " ".join(title.lower().split()), start_date, ev.get("event_url") or ev.get("organizer_name")
+
+
+@disk_cache(
+    cache_subdirectory_name="event_enrichment",
+    key_args=("identity", "search_provider", "refinement_provider"),
+    skip_if=lambda args: args["identity"] is None,
+)
+def _enrich_event(
+        identity: tuple[str, str, str | None] | None,
+        event: dict,
+        search_provider: str,
+        refinement_provider: str
+) -> dict | None:
+    """
+    Web search + refinement for one event, returning the refinement's updates (None
+    if the search found nothing). Cached on the event's identity rather than the
+    whole dict, so a relisting with cosmetic differences skips both LLM calls.
+    """
+    title = event.get('title')
+    web_summary = _get_web_search_summary(
+        event_dict_to_enrich=event,
+        provider_for_search=search_provider
+    )
+    if not web_summary:
+        logger.info("💨 No web summary found for '%s', skipping refinement.", title)
+        return None
+
+    logger.info("🛠️ Refining event '%s' with web summary. Refinement provider: %s", title, refinement_provider)
+    return _refine_event_with_web_summary(
+        event=event,
+        web_search_summary=web_summary,
+        provider_for_refinement=refinement_provider
+    )
+
+
 # ── quick test whether we need enrichment ───────────────────────
-def _needs_enrichment(ev: dict) -> bool:
-    """Determines if an event from an aggregator source needs web enrichment."""
-    missing_postcode = not ev.get("location_postcode")
+_VENUE = EventLocationType.venue.value
 
-    missing_organizer = not ev.get("organizer_name")
-    missing_venue_address = (
-            ev.get("location_type") == EventLocationType.venue.value and not ev.get("location_address_verbatim"))
 
-    return missing_postcode or missing_organizer or missing_venue_address
+def _needs_enrichment(ev: dict) -> bool:
+    """Determines if an event from an aggregator source needs web enrichment."""
+    # Short-circuits on the first missing field
+    return (
+        not ev.get("location_postcode")
+        or not ev.get("organizer_name")
+        or (ev.get("location_type") == _VENUE and not ev.get("location_address_verbatim"))
+    )
 
 
 # ── minimal completeness gate  (after optional enrichment) ─────
 def _is_complete(ev: dict, is_aggregator: bool) -> bool:
     """Return True iff the event dict meets minimal quality rules."""
-    if not ev.get("title") or not ev.get("start_date") or not ev.get("location_type"):
-        logger.debug(msg=f"🚫 Event incomplete (title, start_date, or location_type missing): {ev.get('title')}")
+    get = ev.get
+    title, location_type = get("title"), get("location_type")
+    if not title or not get("start_date") or not location_type:
+        logger.debug("🚫 Event incomplete (title, start_date, or location_type missing): %s", title)
         return False
-    if float(ev.get("parsing_confidence_score", 0)) < 0.4:
-        logger.debug(
-            msg=f"📉 Event incomplete (low confidence after processing): {ev.get('title')}, score: {ev.get('parsing_confidence_score')}")
+    score = get("parsing_confidence_score", 0)
+    if float(score) < 0.4:
+        logger.debug("📉 Event incomplete (low confidence after processing): %s, score: %s", title, score)
         return False
 
     if is_aggregator:
-        if not ev.get("organizer_name"):
-            logger.debug(msg=f"🏢 Aggregator event incomplete (organizer_name missing): {ev.get('title')}")
+        if not get("organizer_name"):
+            logger.debug("🏢 Aggregator event incomplete (organizer_name missing): %s", title)
             return False
-        if ev.get("location_type") == EventLocationType.venue.value and (
-                (not ev.get("location_address_verbatim") or (not ev.get("location_postcode")))):
-            logger.debug(msg=f"🗺️ Aggregator event incomplete (venue address missing): {ev.get('title')}")
+        if location_type == _VENUE and (not get("location_address_verbatim") or not get("location_postcode")):
+            logger.debug("🗺️ Aggregator event incomplete (venue address missing): %s", title)
             return False
 
-        if not (ev.get("event_url") or ev.get("booking_url")):
-            logger.debug(msg=f"🔗 Aggregator event incomplete (event/booking URL missing): {ev.get('title')}")
+        if not (get("event_url") or get("booking_url")):
+            logger.debug("🔗 Aggregator event incomplete (event/booking URL missing): %s", title)
             return False
     return True
 
 
 # ─────────────────── LLM-specific sub-routines ────────────────────
 
-@disk_cache(cache_subdirectory_name="initial_extraction")
-def _perform_initial_event_extraction(
+def _extraction_request(
         processed_email_body: str,
-        extraction_system_prompt: str,
+        extraction_system_prompt: tuple[str, str],
         extraction_provider: str
-) -> list[dict]:
-    """
-    Calls the LLM to perform the initial extraction of events from the email body.
-    Returns a list of raw event dictionaries.
-    Results are cached to disk via decorator.
-    """
+) -> dict:
+    """`call_llm` kwargs for the initial extraction of one email (LLM Call #1)."""
     if extraction_provider not in MODEL_CONFIGS:
-        logger.error(msg=f"🛑 Extraction provider '{extraction_provider}' not supported.")
+        logger.error("🛑 Extraction provider '%s' not supported.", extraction_provider)
         raise NotImplementedError(f"Extraction provider '{extraction_provider}' not supported")
 
     model_config = MODEL_CONFIGS[extraction_provider]
-    extraction_model = model_config["model"]
-    extraction_response_format = model_config.get("response_format")
-
-    logger.info(
-        msg=f"✨ Making call to {extraction_provider}:{extraction_model} to extract initial set of events....")
-
-    raw_completion_content = call_llm(
+    return dict(
         provider=extraction_provider,
-        model=extraction_model,
+        model=model_config["model"],
         system=extraction_system_prompt,
         user=processed_email_body,
-        response_format=extraction_response_format,
-        temperature=0.1
+        response_format=model_config.get("response_format"),
+        temperature=0.1,
+        stage="extraction"
     )
 
+
+def _parse_extraction(raw_completion_content: str | None) -> list[dict]:
+    """The raw event dicts under the extraction response's 'events' key ([] if malformed)."""
     extracted_event_list: list[dict] = []
     if raw_completion_content:
         try:
-            parsed_json_response = json.loads(s=raw_completion_content)
+            parsed_json_response = orjson.loads(raw_completion_content)
             if "events" in parsed_json_response and isinstance(parsed_json_response["events"], list):
                 extracted_event_list = parsed_json_response["events"]
-                logger.info(f"🎉 Initial extraction found {len(extracted_event_list)} potential events.")
+                logger.info("🎉 Initial extraction found %s potential events.", len(extracted_event_list))
             else:
                 logger.error(
-                    msg=f"💥  LLM response for event extraction did not contain a list under 'events' key. Response: {raw_completion_content[:500]}...")
-        except json.JSONDecodeError:
-            logger.error(msg=f"💥  Failed to decode JSON from extraction: {raw_completion_content[:500]}...")
+                    "💥  LLM response for event extraction did not contain a list under 'events' key. Response: %.500s...", raw_completion_content)
+        except orjson.JSONDecodeError:
+            logger.error("💥  Failed to decode JSON from extraction: %.500s...", raw_completion_content)
 
     return extracted_event_list
 
 
+@disk_cache(cache_subdirectory_name="initial_extraction")
+def _perform_initial_event_extraction(
+        processed_email_body: str,
+        extraction_system_prompt: tuple[str, str],
+        extraction_provider: str
+) -> list[dict]:
+    """
+    Calls the LLM to perform the initial extraction of events from the email body.
+    Returns a list of raw event dictionaries.
+    Results are cached to disk via decorator.
+    """
+    request = _extraction_request(
+        processed_email_body=processed_email_body,
+        extraction_system_prompt=extraction_system_prompt,
+        extraction_provider=extraction_provider
+    )
+    logger.info(
+        "✨ Making call to %s:%s to extract initial set of events....", extraction_provider, request["model"])
+
+    return _parse_extraction(raw_completion_content=call_llm(**request))
+
+
 def _process_single_extracted_event(
         obj: dict,
         message_id: str,
@@ -342,103 +520,79 @@ def _process_single_extracted_event(
     This includes enrichment, refinement, data cleaning, and validation.
     Returns an Event object or None if processing fails or event is invalid.
     """
-    logger.info(msg=f"⚙️ Processing event: '{obj.get('title')}'")
+    title = obj.get('title')
+    logger.info("⚙️ Processing event: '%s'", title)
 
     obj["email_message_id"] = message_id
     obj["from_aggregator"] = is_aggregator
 
+    # A postcode already written into the address is picked up locally, which may
+    # spare the event its web search + refinement round-trips
+    if is_aggregator and not obj.get("location_postcode") and obj.get("location_address_verbatim"):
+        postcode = find_london_postcode(text=obj["location_address_verbatim"])
+        if postcode:
+            obj["location_postcode"] = postcode
+
     if is_aggregator and _needs_enrichment(ev=obj):
-        logger.info(msg=f"🔍 Event '{obj.get('title')}' needs enrichment. Web search provider: {search_provider}")
-        web_summary = _get_web_search_summary(
-            event_dict_to_enrich=obj,
-            provider_for_search=search_provider
+        logger.info("🔍 Event '%s' needs enrichment. Web search provider: %s", title, search_provider)
+        enrichment_updates = _enrich_event(
+            identity=_event_identity(ev=obj),
+            event=obj,
+            search_provider=search_provider,
+            refinement_provider=refinement_provider
         )
-        if web_summary:
-            logger.info(
-                msg=f"🛠️ Refining event '{obj.get('title')}' with web summary. Refinement provider: {refinement_provider}")
-            enrichment_updates = _refine_event_with_web_summary(
-                event=obj,
-                web_search_summary=web_summary,
-                provider_for_refinement=refinement_provider
-            )
-            if enrichment_updates:
-                obj.update(enrichment_updates)
-                logger.info(f"✅ Event '{obj.get('title')}' updated with refinement data.")
-        else:
-            logger.info(msg=f"💨 No web summary found for '{obj.get('title')}', skipping refinement.")
+        if enrichment_updates:
+            obj.update(enrichment_updates)
+            logger.info("✅ Event '%s' updated with refinement data.", obj.get('title'))
 
     # --- Data cleaning and validation ---
+    # Refinement may have changed these, so bind them only now
+    title = obj.get('title') or 'Untitled Event'
+    start_date = obj.get('start_date')
+    end_date = obj.get('end_date')
+
     if obj.get('end_time') == 'tbc':
         obj['end_time'] = None
     if obj.get('start_time') == 'tbc':
         obj['start_time'] = None
-    if 'start_date' not in obj or obj['start_date'] is None:
-        logger.warning(msg=f"🗓️ Event '{obj.get('title', 'Untitled Event')}' missing start_date, skipping.")
+    if start_date is None:
+        logger.warning("🗓️ Event '%s' missing start_date, skipping.", title)
         return None
 
-    if 'end_date' not in obj:
-        obj['end_date'] = None
-
-    if obj.get('start_date') and obj.get('end_date'):
+    if start_date and end_date:
         try:
-            start_dt = datetime.fromisoformat(str(obj['start_date']).split('T')[0])
-            end_dt = datetime.fromisoformat(str(obj['end_date']).split('T')[0])
-            if start_dt > end_dt:
+            if date.fromisoformat(start_date[:10]) > date.fromisoformat(end_date[:10]):
                 logger.error(
-                    msg=f"🛑 Start date ({obj['start_date']}) cannot be later than end date ({obj['end_date']}) for event: {obj.get('title', 'Untitled Event')}")
+                    "🛑 Start date (%s) cannot be later than end date (%s) for event: %s", start_date, end_date, title)
                 return None
         except (ValueError, TypeError) as e:
             logger.error(
-                msg=f"💥 Invalid date format for event '{obj.get('title', 'Untitled Event')}': {e}. Start: {obj.get('start_date')}, End: {obj.get('end_date')}")
+                "💥 Invalid date format for event '%s': %s. Start: %s, End: %s", title, e, start_date, end_date)
             return None
 
     if isinstance(obj.get('recurrence_rule'), str):
         obj['recurrence_rule'] = obj['recurrence_rule'].removeprefix('RRULE:')
 
-    if not obj.get('time_of_day'):
-        obj['time_of_day'] = 'tbc'
-
-    # Ensure list types for target_audiences and event_types
-    if "target_audiences" not in obj or not isinstance(obj["target_audiences"], list):
-        obj["target_audiences"] = []
-
-    if "event_types" not in obj or not isinstance(obj["event_types"], list):
-        obj["event_types"] = []
-
-    if len(obj.get('target_audiences', [])):
-        allowed = {e.value for e in EventTargetAudience}
-        original_audiences = list(obj["target_audiences"])
-        filtered_audiences = [t for t in original_audiences if isinstance(t, str) and t in allowed]
-        if len(original_audiences) > len(filtered_audiences):
-            rejected_audiences = set(original_audiences) - set(filtered_audiences)
-            logger.warning(
-                msg=f"✂️ Filtered out target audiences for '{obj.get('title', 'Untitled Event')}': {rejected_audiences}")
-        obj["target_audiences"] = filtered_audiences or ["tbc"]
-    else:
-        obj["target_audiences"] = ["tbc"]
-
-    if len(obj.get('event_types', [])):
-        allowed = {e.value for e in EventType}
-        original_types = list(obj["event_types"])
-        filtered_types = [t for t in original_types if isinstance(t, str) and t in allowed]
-        if len(original_types) > len(filtered_types):
-            rejected_types = set(original_types) - set(filtered_types)
-            logger.warning(
-                msg=f"🏷️ Filtered out event types for '{obj.get('title', 'Untitled Event')}': {rejected_types}")
-        obj["event_types"] = filtered_types or ["tbc"]
-    else:
-        obj["event_types"] = ["tbc"]
-
-    # Default values for potentially missing fields
-    if "title" not in obj or not obj["title"]:
+    # Missing, null or empty fields fall back to their defaults in one pass
+    for field, default in _EVENT_FIELD_DEFAULTS.items():
+        if obj.get(field) in (None, ""):
+            obj[field] = default
+
+    # Enum-list fields keep only allowed values, falling back to ["tbc"]
+    for field, allowed, label, emoji in _ENUM_LIST_FIELDS:
+        values = obj.get(field)
+        if not isinstance(values, list):
+            values = []
+        kept = [v for v in values if isinstance(v, str) and v in allowed]
+        if len(kept) < len(values):
+            rejected = [v for v in values if v not in kept]
+            logger.warning("%s Filtered out %s for '%s': %s", emoji, label, title, rejected)
+        obj[field] = kept or ["tbc"]
+
+    if not obj.get("title"):
         logger.warning(
-            msg=f"📛 Event missing title, setting to 'Untitled Event'. Original obj snippet: {str(obj)[:200]}")
+            "📛 Event missing title, setting to 'Untitled Event'. Original obj snippet: %.200s", obj)
         obj["title"] = "Untitled Event"
-    obj.setdefault("summary", "")
-    obj.setdefault("description_verbatim", "")
-    obj.setdefault("occurrence_type", EventOccurrenceType.tbc.value)
-    obj.setdefault("location_type", EventLocationType.tbc.value)
-    obj.setdefault("parsing_confidence_score", 0.5)
 
     # ensure these weren't over-riden
     obj["email_message_id"] = message_id
@@ -457,25 +611,30 @@ def _process_single_extracted_event(
         return event_model
     except Exception as e:
         logger.error(
-            msg=f"Failed to create Event Pydantic model for '{obj.get('title', 'Untitled')}' due to: {e}. Object data: {obj}")
+            "Failed to create Event Pydantic model for '%s' due to: %s. Object data: %s", title, e, obj)
         return None
 
 
 # ─────────────────── main extraction routine ───────────────────────────
+# Events of one aggregator email are enriched in parallel (two LLM round-trips each).
+# This multiplies with MAX_EXTRACTION_WORKERS, so keep the product within rate limits.
+MAX_EVENT_WORKERS = 4
 
-def extract_events(
+
+def _prepare_extraction(
         email_body: str,
         email_sent_date: str,
         message_id: str,
-        is_aggregator: bool,
-        extraction_provider: str,
-        search_provider: str,
-        refinement_provider: str
-) -> ta.List[Event]:
+        is_aggregator: bool
+) -> tuple[str, tuple[str, str]] | None:
     """
-    Run LLM → structured list[Event].
+    Pre-process an email body and build its extraction system prompt.
+    Returns `(processed_body, system_prompt)`, or None if there is nothing to extract.
     """
-    logger.info(f"🏁 Starting event extraction for email_id: {message_id}, is_aggregator: {is_aggregator}")
+    # Checked on the raw body, so event-less emails also skip trimming and link resolution
+    if _EVENT_HINTS_RE.search(email_body) is None:
+        logger.info("🙅 Email %s has no event hints – skipping extraction.", message_id)
+        return None
 
     # 1. Pre-process email body
     processed_email_body = email_body
@@ -486,41 +645,94 @@ def extract_events(
         # Resolve links *after* trimming, as trimming might remove context for resolving
         processed_email_body = resolve_links_in_body(body=trimmed_body)
 
-        # Attempt to remove unsubscribe sections
-    match = re.search(pattern=r'^(.*?)(?=unsubscribe\\b.*$)\'', string=processed_email_body,
-                      flags=re.IGNORECASE | re.DOTALL)
-    if match:
+    # Attempt to remove unsubscribe sections
+    match = _UNSUBSCRIBE_FOOTER_RE.search(processed_email_body)
+    if match and match.group(1).strip():
         processed_email_body = match.group(1).rstrip()
 
     if not processed_email_body.strip():
         logger.warning("📧 Email body is empty after pre-processing. No events to extract.")
-        return []
+        return None
 
     # 2. Prepare for initial extraction
-    day_name = datetime.fromisoformat(email_sent_date).strftime(format="%A")
-    enum_map = {
-        "EventOccurrenceType": EventOccurrenceType,
-        "EventLocationType": EventLocationType,
-        "EventBookingType": EventBookingType,
-        "EventTargetAudience": EventTargetAudience,
-        "EventType": EventType,
-    }
-    ENUMS_TXT = "\n".join(
-        f"{n}: {', '.join(e.value for e in enum_cls)}"
-        for n, enum_cls in enum_map.items()
-    )
-    schema = Event.model_json_schema()
-    schema.pop("title", None)
-    SCHEMA_TXT = json.dumps(obj=schema, separators=(",", ":"))
+    return processed_email_body, _extraction_system_prompt(email_sent_date)
+
 
-    extraction_system_prompt = construct_extract_events_sys_prompt(
+def _extraction_system_prompt(email_sent_date: str, packed: bool = False) -> tuple[str, str]:
+    day_name = datetime.fromisoformat(email_sent_date).strftime(format="%A")
+    # Memoized on its arguments, so emails sent on the same date share one prompt
+    return construct_extract_events_sys_prompt(
         day_name=day_name,
         email_sent_date=email_sent_date,
         fields_txt=FIELDS_TXT,
-        schema_txt=SCHEMA_TXT,
+        schema_txt=_packed_extraction_schema_txt() if packed else _extraction_schema_txt(),
         enums_txt=ENUMS_TXT,
+        packed=packed,
     )
 
+
+def _process_extracted_events(
+        extracted_raw_event_list: list[dict],
+        message_id: str,
+        is_aggregator: bool,
+        search_provider: str,
+        refinement_provider: str
+) -> ta.List[Event]:
+    """
+    Enrich, clean and validate the raw extracted events of one email.
+    Enrichment (LLM Call #2) and Refinement (LLM Call #3) happen inside _process_single_extracted_event.
+    """
+    def _process(raw_event_obj: dict) -> ta.Optional[Event]:
+        return _process_single_extracted_event(
+            obj=raw_event_obj,
+            message_id=message_id,
+            is_aggregator=is_aggregator,
+            search_provider=search_provider,
+            refinement_provider=refinement_provider
+        )
+
+    # Only aggregator events go through web search + refinement, so only they are
+    # worth overlapping; results keep the extraction order either way
+    if is_aggregator and len(extracted_raw_event_list) > 1:
+        with ThreadPoolExecutor(max_workers=MAX_EVENT_WORKERS) as pool:
+            processed_event_models = list(pool.map(_process, extracted_raw_event_list))
+    else:
+        processed_event_models = [_process(raw_event_obj) for raw_event_obj in extracted_raw_event_list]
+
+    final_events: list[Event] = []
+    for processed_event_model in processed_event_models:
+        if processed_event_model:
+            final_events.append(processed_event_model)
+            logger.info("☀️ Finished processing event: %s", processed_event_model)
+
+    logger.info("🏁 Finished event extraction for email_id: %s. Found %s valid events.", message_id, len(final_events))
+    return final_events
+
+
+def extract_events(
+        email_body: str,
+        email_sent_date: str,
+        message_id: str,
+        is_aggregator: bool,
+        extraction_provider: str,
+        search_provider: str,
+        refinement_provider: str
+) -> ta.List[Event]:
+    """
+    Run LLM → structured list[Event].
+    """
+    logger.info("🏁 Starting event extraction for email_id: %s, is_aggregator: %s", message_id, is_aggregator)
+
+    prepared = _prepare_extraction(
+        email_body=email_body,
+        email_sent_date=email_sent_date,
+        message_id=message_id,
+        is_aggregator=is_aggregator
+    )
+    if prepared is None:
+        return []
+    processed_email_body, extraction_system_prompt = prepared
+
     # 3. Perform initial event extraction (LLM Call #1)
     extracted_raw_event_list = _perform_initial_event_extraction(
         processed_email_body=processed_email_body,
@@ -533,91 +745,334 @@ def extract_events(
         return []
 
     # 4. Process each extracted event object
-    # Enrichment (LLM Call #2) and Refinement (LLM Call #3) happen inside _process_single_extracted_event
-    # The refinement provider is now explicitly passed. It makes sense for the refinement
-    # to use the same provider as the websearch that informed it.
-    # Or, if websearch and refinement should use base_provider, that can be passed.
-    # For now, aligning refinement with websearch_provider seems logical.
-    final_events: list[Event] = []
-    for raw_event_obj in extracted_raw_event_list:
-        processed_event_model = _process_single_extracted_event(
-            obj=raw_event_obj,
-            message_id=message_id,
-            is_aggregator=is_aggregator,
+    return _process_extracted_events(
+        extracted_raw_event_list=extracted_raw_event_list,
+        message_id=message_id,
+        is_aggregator=is_aggregator,
+        search_provider=search_provider,
+        refinement_provider=refinement_provider
+    )
+
+
+# ─────────────────── orchestration loop ───────────────────────────
+# Emails are extracted in parallel; each worker spends nearly all its time waiting on
+# LLM round-trips (extraction, web search, refinement), so overlapping them is where
+# the wall-clock time goes. Kept low enough to stay inside the providers' rate limits.
+MAX_EXTRACTION_WORKERS = 8
+
+
+# Short emails sent on the same date (so sharing one extraction prompt) are packed
+# into a single extraction request, saving a round-trip and a system prompt per email
+PACK_MAX_EMAIL_CHARS = 4_000
+PACK_MAX_CHARS = 30_000
+PACK_MAX_EMAILS = 8
+
+
+def _pack_groups(email_recs: list[dict]) -> ta.Iterator[list[dict]]:
+    """
+    Yield `email_recs` in groups to extract together: emails over PACK_MAX_EMAIL_CHARS
+    on their own, shorter ones per send date, up to PACK_MAX_EMAILS / PACK_MAX_CHARS.
+    """
+    by_date: dict[str, list[dict]] = {}
+    for email_rec in email_recs:
+        if len(email_rec.get("body") or "") > PACK_MAX_EMAIL_CHARS:
+            yield [email_rec]
+        else:
+            by_date.setdefault(email_rec.get("date")[:10], []).append(email_rec)
+
+    for same_date in by_date.values():
+        group: list[dict] = []
+        chars = 0
+        for email_rec in same_date:
+            body_len = len(email_rec.get("body") or "")
+            if group and (len(group) >= PACK_MAX_EMAILS or chars + body_len > PACK_MAX_CHARS):
+                yield group
+                group, chars = [], 0
+            group.append(email_rec)
+            chars += body_len
+        if group:
+            yield group
+
+
+def _scatter_packed_extraction(
+        raw_completion_content: str | None,
+        message_ids: list[str],
+) -> tuple[dict[str, list[dict]], list[str]]:
+    """
+    Split a packed extraction response into `(raw events by message_id, message_ids
+    to extract on their own)`. Emails the response has no entry for are re-run; if it
+    is malformed or has an entry for an unknown id, nothing in it can be attributed
+    with confidence, so every email is re-run.
+    """
+    events_by_id: dict[str, list[dict]] = {}
+    try:
+        results = orjson.loads(raw_completion_content or "").get("results")
+    except (orjson.JSONDecodeError, AttributeError):
+        results = None
+    if not isinstance(results, list):
+        logger.error("💥  Packed extraction had no 'results' list: %.500s...", raw_completion_content)
+        return {}, list(message_ids)
+
+    known = set(message_ids)
+    for result in results:
+        message_id = str(result.get("email_message_id") or "").strip() if isinstance(result, dict) else ""
+        events = result.get("events") if isinstance(result, dict) else None
+        if message_id not in known or not isinstance(events, list):
+            logger.warning("🧭 Packed result can't be attributed to an email (%r); re-running the pack.", message_id)
+            return {}, list(message_ids)
+        events_by_id.setdefault(message_id, []).extend(events)
+
+    return events_by_id, [message_id for message_id in message_ids if message_id not in events_by_id]
+
+
+def _extract_and_save_group(
+        email_recs: list[dict],
+        extraction_provider: str,
+        search_provider: str,
+        refinement_provider: str
+) -> list[tuple[str, bool, str | None]]:
+    """
+    `_extract_and_save` for a group from `_pack_groups`: the emails that still have
+    something to extract after pre-processing share one extraction request, and each
+    one's events are then processed and saved as usual. Emails whose events can't be
+    attributed from the packed response go through `_extract_and_save` one at a time.
+    Returns the `emails_processed` rows to write for emails without events.
+    """
+    if len(email_recs) == 1:
+        processed_row = _extract_and_save(email_recs[0], extraction_provider, search_provider, refinement_provider)
+        return [processed_row] if processed_row else []
+
+    processed_rows: list[tuple[str, bool, str | None]] = []
+    packed: list[tuple[dict, str]] = []
+    for email_rec in email_recs:
+        prepared = _prepare_extraction(
+            email_body=email_rec.get("body") or "",
+            email_sent_date=email_rec.get("date")[:10],
+            message_id=email_rec["message_id"],
+            is_aggregator=email_rec["newsletter_source_type"] == "aggregate"
+        )
+        if prepared is None:
+            processed_rows.append((email_rec["message_id"], True, "no_events_found"))
+            continue
+        packed.append((email_rec, prepared[0]))
+
+    if not packed:
+        return processed_rows
+
+    message_ids = [email_rec["message_id"] for email_rec, _ in packed]
+    logger.info("📦 Extracting %s short emails in one request: %s", len(packed), message_ids)
+    # The group shares a send date, so every email has the same system prompt
+    request = _extraction_request(
+        processed_email_body=construct_packed_emails_user_prompt(
+            [(email_rec["message_id"], body) for email_rec, body in packed]
+        ),
+        extraction_system_prompt=_extraction_system_prompt(packed[0][0].get("date")[:10], packed=True),
+        extraction_provider=extraction_provider
+    )
+    events_by_id, rerun_ids = _scatter_packed_extraction(call_llm(**request), message_ids)
+    if rerun_ids:
+        logger.info("🔁 Extracting %s packed emails on their own: %s", len(rerun_ids), rerun_ids)
+
+    for email_rec, _ in packed:
+        msg_id = email_rec["message_id"]
+        if msg_id in rerun_ids:
+            processed_row = _extract_and_save(email_rec, extraction_provider, search_provider, refinement_provider)
+            if processed_row:
+                processed_rows.append(processed_row)
+            continue
+
+        raw_event_list = events_by_id[msg_id]
+        extracted_events = _process_extracted_events(
+            extracted_raw_event_list=raw_event_list,
+            message_id=msg_id,
+            is_aggregator=email_rec["newsletter_source_type"] == "aggregate",
             search_provider=search_provider,
             refinement_provider=refinement_provider
-        )
-        if processed_event_model:
-            final_events.append(processed_event_model)
-            logger.info(msg=f"☀️ Finished processing event: {processed_event_model}")
+        ) if raw_event_list else []
+        processed_row = _save_extracted(msg_id=msg_id, extracted_events=extracted_events)
+        if processed_row:
+            processed_rows.append(processed_row)
+    return processed_rows
 
-    logger.info(f"🏁 Finished event extraction for email_id: {message_id}. Found {len(final_events)} valid events.")
-    return final_events
+
+def _extract_and_save(
+        email_rec: dict,
+        extraction_provider: str,
+        search_provider: str,
+        refinement_provider: str
+) -> tuple[str, bool, str | None] | None:
+    """
+    Extract one newsletter's events and save them together with its processed marker.
+    Returns the `emails_processed` row to write instead when no events were found.
+    """
+    msg_id = email_rec["message_id"]
+    logger.info("📧  Processing email %s[...]%s", msg_id[:10], msg_id[-15:])
+
+    # The stored date is ISO 8601, so its date part is the first 10 characters;
+    # extract_events parses it (once) for the weekday
+    send_date_str = email_rec.get("date")[:10]
+
+    is_agg = email_rec["newsletter_source_type"] == "aggregate"
+    extracted_events = extract_events(
+        email_body=email_rec.get("body") or "",
+        email_sent_date=send_date_str,
+        message_id=msg_id,
+        is_aggregator=is_agg,
+        extraction_provider=extraction_provider,
+        search_provider=search_provider,
+        refinement_provider=refinement_provider
+    )
+
+    return _save_extracted(msg_id=msg_id, extracted_events=extracted_events)
+
+
+def _save_extracted(msg_id: str, extracted_events: list[Event]) -> tuple[str, bool, str | None] | None:
+    """
+    Save an email's events together with its processed marker, or return the
+    `emails_processed` row to write instead when there are none.
+    """
+    if not extracted_events:
+        return msg_id, True, "no_events_found"
+
+    logger.info("🎉 Events found: %s...", [str(e)[:100] for e in extracted_events])
+    # Events + processed marker land together, so a crash can't leave one without the other
+    save_events_and_mark(events=extracted_events, email_message_id=msg_id, note="is_newsletter")
+    return None
 
 
-# ─────────────────── orchestration loop ───────────────────────────
 def main(
         extraction_provider: str = PROVIDER_OPENAI,
         search_provider: str = PROVIDER_OPENAI,
         refinement_provider: str = PROVIDER_OPENAI,
         batch: int = N_CHARS_MAX
 ) -> None:
-    emails = list(fetch_unprocessed_emails(batch_size=batch))
-    total = len(emails)
-    by_type = {"aggregate": 0, "venue": 0, "unknown": 0}
-    for email_item in emails:  # Renamed to avoid conflict
-        t = email_item.get("newsletter_source_type", "unknown")
-        if t not in by_type:  # Ensure key exists
-            by_type[t] = 0
-        by_type[t] += 1
-    logger.info(
-        msg=f"📊 Processing {total} unprocessed emails: {by_type['aggregate']} aggregate, {by_type['venue']} venue, {by_type['unknown']} unknown, {total - by_type['aggregate'] - by_type['venue'] - by_type['unknown']} other.")
+    by_type: Counter[str] = Counter()
 
-    for idx, email_rec in enumerate(emails):
+    # emails_processed rows are collected and upserted together at the end (or on failure)
+    processed: list[tuple[str, bool, str | None]] = []
 
-        msg_id = email_rec["message_id"]
-        body = email_rec.get("body") or ""
-
-        assert msg_id is not None
+    def _collect(done: ta.Iterable[Future]) -> None:
+        for future in done:
+            processed.extend(future.result())
 
-        if email_already_parsed(message_id=msg_id):
-            logger.info(msg=f"✅  Email already processed for {msg_id} – skipping processing.")
-            continue
+    # Oversized and non-newsletter emails are marked server-side up front, and the
+    # fetch filters them out, so their bodies are never downloaded
+    mark_skipped_emails(max_body_chars=N_CHARS_MAX)
 
-        if len(body) > N_CHARS_MAX:
-            logger.info(msg=f"📏 Email {msg_id} too large – skipping.")
-            mark_email_processed(message_id=msg_id, parsed_ok=False, note="body_too_large")
-            continue
-
-        if not email_rec.get("is_newsletter"):
-            logger.info(msg=f"📰  Email {msg_id} is not a newsletter – skipping.")
-            mark_email_processed(message_id=msg_id, parsed_ok=False, note="not_newsletter")
-            continue
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_EXTRACTION_WORKERS) as pool:
+            in_flight: set[Future] = set()
+            # Emails arrive a page at a time; only the current page plus the emails
+            # being extracted are held in memory
+            for page in fetch_unprocessed_emails(batch_size=batch, max_body_chars=N_CHARS_MAX, newsletters_only=True):
+                by_type.update(e.get("newsletter_source_type") or "unknown" for e in page)
+
+                # One batched probe per page instead of two queries per email
+                parsed_index = load_parsed_index(ids=[e["message_id"] for e in page])
+
+                to_extract: list[dict] = []
+                for email_rec in page:
+                    msg_id = email_rec["message_id"]
+
+                    assert msg_id is not None
+
+                    if msg_id in parsed_index:
+                        logger.info("✅  Email already processed for %s – skipping processing.", msg_id)
+                        continue
+                    to_extract.append(email_rec)
+
+                for group in _pack_groups(to_extract):
+                    # Backpressure: don't queue up more emails than the workers can take
+                    if len(in_flight) >= 2 * MAX_EXTRACTION_WORKERS:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        _collect(done)
+                    in_flight.add(pool.submit(
+                        _extract_and_save_group, group, extraction_provider, search_provider, refinement_provider
+                    ))
+
+            _collect(as_completed(in_flight))
+    finally:
+        mark_emails_processed_bulk(processed)
+        close_browsers()
+
+    total = sum(by_type.values())
+    logger.info(
+        "📊 Processed %s unprocessed emails: %s aggregate, %s venue, %s unknown, %s other.",
+        total, by_type['aggregate'], by_type['venue'], by_type['unknown'],
+        total - by_type['aggregate'] - by_type['venue'] - by_type['unknown'])
 
-        logger.info(msg=f"📧  Processing email {msg_id[:10]}[...]{msg_id[-15:]}")
 
-        sent_dt = datetime.fromisoformat(email_rec.get("date"))
-        send_date_str = sent_dt.strftime(format="%Y-%m-%d")
+def main_batch(
+        extraction_provider: str = PROVIDER_OPENAI,
+        search_provider: str = PROVIDER_OPENAI,
+        refinement_provider: str = PROVIDER_OPENAI,
+        batch: int = N_CHARS_MAX
+) -> None:
+    """
+    Backfill variant of `main`: the initial extraction of every email goes through a
+    single provider Batch API job (about half the price, its own rate-limit pool, up
+    to 24h latency) instead of one real-time call per email. Enrichment still runs in
+    real time afterwards, as its web search isn't available through the Batch APIs.
+    Run instead of `main` when BATCH_MODE=true.
+    """
+    mark_skipped_emails(max_body_chars=N_CHARS_MAX)
+
+    # The whole backlog goes into one job, so (unlike `main`) it is fetched up front
+    email_recs = [
+        email_rec
+        for page in fetch_unprocessed_emails(batch_size=batch, max_body_chars=N_CHARS_MAX, newsletters_only=True)
+        for email_rec in page
+    ]
+    parsed_index = load_parsed_index(ids=[e["message_id"] for e in email_recs])
+    email_recs = [e for e in email_recs if e["message_id"] not in parsed_index]
+
+    def _prepare(email_rec: dict) -> tuple[str, tuple[str, str]] | None:
+        return _prepare_extraction(
+            email_body=email_rec.get("body") or "",
+            email_sent_date=email_rec.get("date")[:10],
+            message_id=email_rec["message_id"],
+            is_aggregator=email_rec["newsletter_source_type"] == "aggregate"
+        )
 
-        is_agg = email_rec["newsletter_source_type"] == "aggregate"
-        extracted_events = extract_events(
-            email_body=body,
-            email_sent_date=send_date_str,
+    def _finish(email_rec: dict, raw_completion_content: str | None) -> tuple[str, bool, str | None] | None:
+        msg_id = email_rec["message_id"]
+        extracted_events = _process_extracted_events(
+            extracted_raw_event_list=_parse_extraction(raw_completion_content=raw_completion_content),
             message_id=msg_id,
-            is_aggregator=is_agg,
-            extraction_provider=extraction_provider,
+            is_aggregator=email_rec["newsletter_source_type"] == "aggregate",
             search_provider=search_provider,
             refinement_provider=refinement_provider
         )
+        return _save_extracted(msg_id=msg_id, extracted_events=extracted_events)
 
-        if extracted_events:
-            logger.info(msg=f"🎉 Events found: {[str(e)[:100] for e in extracted_events]}...")
-
-            save_events_to_db(events=extracted_events, email_message_id=msg_id)
-            mark_email_processed(message_id=msg_id, parsed_ok=True, note="is_newsletter")
-        else:
-            mark_email_processed(message_id=msg_id, parsed_ok=True, note="no_events_found")
+    processed: list[tuple[str, bool, str | None]] = []
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_EXTRACTION_WORKERS) as pool:
+            # Pre-processing resolves links over the network, so it is overlapped too
+            to_extract: list[dict] = []
+            jobs: list[dict] = []
+            for email_rec, prepared in zip(email_recs, pool.map(_prepare, email_recs)):
+                if prepared is None:
+                    processed.append((email_rec["message_id"], True, "no_events_found"))
+                    continue
+                processed_email_body, extraction_system_prompt = prepared
+                to_extract.append(email_rec)
+                jobs.append(_extraction_request(
+                    processed_email_body=processed_email_body,
+                    extraction_system_prompt=extraction_system_prompt,
+                    extraction_provider=extraction_provider
+                ))
+
+            logger.info("📦 Extracting %s emails through the Batch API.", len(jobs))
+            contents = call_llm_batch(jobs) if jobs else []
+            processed.extend(row for row in pool.map(_finish, to_extract, contents) if row)
+    finally:
+        mark_emails_processed_bulk(processed)
+        close_browsers()
 
 
 if __name__ == "__main__":
-    main()
+    if batch_mode_enabled():
+        main_batch()
+    else:
+        main()
@@ -4,11 +4,12 @@ Enrich events rows into events_enriched for front-end cards.
 
 from __future__ import annotations
 
-import json, os, logging
+import os, logging
 from datetime import datetime, date, timezone
 from typing import Any, List
 from urllib.parse import quote
 
+import orjson
 from dotenv import load_dotenv
 from openai import OpenAI
 from supabase import create_client, Client
@@ -16,6 +17,7 @@ from dateutil import parser as dtparser
 from dateutil.rrule import rrulestr, WEEKLY
 
 from newsletter.constants import SKIP_EMAIL_ADDRESSES
+from newsletter.database import IN_FILTER_CHUNK_SIZE
 from newsletter.types import (
     EventType, EventTargetAudience,
 )
@@ -210,7 +212,7 @@ def gpt_pretty(ev: dict[str, Any], venue_name: str) -> dict[str, str] | None:
         response_format={"type": "json_object"},
     )
     content = r.choices[0].message.content
-    return json.loads(content)
+    return orjson.loads(content)
 
 
 def extract_domain(email: str | None) -> str | None:
@@ -256,6 +258,21 @@ def enrich_batch(batch: int = 500) -> None:
         logger.error(f"CRITICAL: Failed to fetch batch of events: {e}. Aborting.", exc_info=True)
         return
 
+    # --- Prefetch sender data for the whole batch (one IN query per chunk, not one per event) ---
+    emails_by_id: dict[str, dict] = {}
+    msg_ids = list({e["email_message_id"] for e in events_to_process if e.get("email_message_id")})
+    for start in range(0, len(msg_ids), IN_FILTER_CHUNK_SIZE):
+        try:
+            email_resp = (
+                sb.table("emails")
+                .select("message_id, email_address, sender_name")
+                .in_("message_id", msg_ids[start:start + IN_FILTER_CHUNK_SIZE])
+                .execute()
+            )
+            emails_by_id.update((row["message_id"], row) for row in (email_resp.data or []))
+        except Exception as email_err:
+            logger.error(f"DBError prefetching email data: {email_err}")
+
     # --- Columns to select for venue ---
     venue_columns = "id, name, latitude, longitude, url, postcode, neighbourhood, borough"
 
@@ -270,12 +287,7 @@ def enrich_batch(batch: int = 500) -> None:
             # --- Fetch associated email data ---
             email_data = {}
             if msg_id := e.get("email_message_id"):
-                try:
-                    email_resp = sb.table("emails").select("email_address, sender_name").eq("message_id",
-                                                                                            msg_id).maybe_single().execute()
-                    email_data = email_resp.data or {}
-                except Exception as email_err:
-                    logger.error(f"DBError fetching email data for message_id {msg_id} (event {eid}): {email_err}")
+                email_data = emails_by_id.get(msg_id, {})
             else:
                 logger.warning(f"Event {eid} has no email_message_id.")
 
@@ -1,9 +1,9 @@
 import argparse
 import os
-import json
 import logging
 import datetime
 import typing as t
+import orjson
 from openai import OpenAI
 from supabase import create_client
 from dotenv import load_dotenv
@@ -156,8 +156,8 @@ def score_events_with_ai(events: t.List[t.Dict[str, t.Any]]) -> t.List[t.Dict[st
         raw_response = completion.choices[0].message.content.strip()
         try:
             raw_response = replace_json_gates(raw_response)
-            data = json.loads(raw_response)
-        except json.JSONDecodeError as e:
+            data = orjson.loads(raw_response)
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse AI response as JSON or Python literal: {e}")
             data = []
 
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from newsletter.utils import caching
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(caching, "CACHE_BASE_DIR", tmp_path)
+    return tmp_path / "test"
+
+
+def _counting(calls):
+    def func(x, timeout=10, fresh=False):
+        calls.append(x)
+        return {"x": x, "call": len(calls)}
+    return func
+
+
+def test_hit_after_miss(cache_dir):
+    calls = []
+    cached = caching.disk_cache("test")(_counting(calls))
+    assert cached(1) == cached(1) == {"x": 1, "call": 1}
+    assert cached(2) == {"x": 2, "call": 2}
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_expired_entry_is_a_miss(cache_dir):
+    calls = []
+    cached = caching.disk_cache("test", ttl_days=1)(_counting(calls))
+    cached(1)
+    (cache_file,) = cache_dir.iterdir()
+    two_days_ago = time.time() - 2 * 86_400
+    os.utime(cache_file, (two_days_ago, two_days_ago))
+    assert cached(1) == {"x": 1, "call": 2}
+    # ... and the refreshed entry is served again
+    assert cached(1) == {"x": 1, "call": 2}
+
+
+def test_key_args_ignore_other_arguments(cache_dir):
+    calls = []
+    cached = caching.disk_cache("test", key_args=("x",))(_counting(calls))
+    cached(1, timeout=10)
+    assert cached(1, timeout=60) == {"x": 1, "call": 1}
+    assert calls == [1]
+
+
+def test_skip_if_bypasses_the_cache(cache_dir):
+    calls = []
+    cached = caching.disk_cache("test", skip_if=lambda arguments: arguments["fresh"])(_counting(calls))
+    cached(1, fresh=True)
+    cached(1, fresh=True)
+    assert calls == [1, 1]
+    assert not any(cache_dir.iterdir())
+
+
+def test_async_functions_are_cached(cache_dir):
+    calls = []
+
+    @caching.disk_cache("test")
+    async def fetch(x):
+        calls.append(x)
+        return x * 2
+
+    assert asyncio.run(fetch(2)) == asyncio.run(fetch(2)) == 4
+    assert calls == [2]
@@ -1,6 +1,9 @@
+import functools
 import logging
 import re
+import threading
 import typing as ta
+from concurrent.futures import ThreadPoolExecutor
 
 from playwright.sync_api import sync_playwright
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
@@ -11,54 +14,104 @@ from newsletter.constants import TRACKERS
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-playwright_ctx = None
-browser = None
-context = None
+# Playwright's sync API is bound to the thread that started it, and emails are
+# processed on several threads, so each thread lazily gets its own browser context
+_playwright_local = threading.local()
+
+# Links in a body are resolved concurrently on one shared pool, which also caps the
+# requests in flight across all emails. The threads are long-lived, so each keeps
+# (at most) one Playwright browser instead of one per email.
+LINK_RESOLVE_WORKERS = 10
+_link_pool = ThreadPoolExecutor(max_workers=LINK_RESOLVE_WORKERS, thread_name_prefix="resolve-link")
+
+# Aggregators link the same tracked URLs across many emails
+RESOLVED_LINK_CACHE_SIZE = 4096
+
+_LINK_RE = re.compile(r"<(https://[^>\s]+)>|(?<!href=\")\b(https://[^\s<>\"']+)\b")
 
 
 def init_playwright_browser():
-    global playwright_ctx, browser, context
+    if getattr(_playwright_local, "playwright_ctx", None) is None:
+        _playwright_local.playwright_ctx = sync_playwright().start()
+        _playwright_local.browser = _playwright_local.playwright_ctx.chromium.launch(headless=True)
+        _playwright_local.context = _playwright_local.browser.new_context()
+    return _playwright_local.context
+
+
+def _close_thread_browser() -> None:
+    """Close the calling thread's Playwright browser, if it started one."""
+    playwright_ctx = getattr(_playwright_local, "playwright_ctx", None)
     if playwright_ctx is None:
-        playwright_ctx = sync_playwright().start()
-        browser = playwright_ctx.chromium.launch(headless=True)
-        context = browser.new_context()
+        return
+    _playwright_local.playwright_ctx = None
+    try:
+        _playwright_local.browser.close()
+        playwright_ctx.stop()
+    except Exception as e:
+        logger.warning("Error closing Playwright browser: %s", e)
+
+
+def close_browsers() -> None:
+    """
+    Close the Playwright browsers started while resolving links. Playwright's sync API
+    only works on the thread that started it, so one close task is pinned to each
+    `_link_pool` worker (the barrier holds every task until all workers have one).
+    Browsers are started again on demand if links are resolved afterwards.
+    """
+    barrier = threading.Barrier(LINK_RESOLVE_WORKERS)
+
+    def _close_on_worker() -> None:
+        barrier.wait()
+        _close_thread_browser()
+
+    for future in [_link_pool.submit(_close_on_worker) for _ in range(LINK_RESOLVE_WORKERS)]:
+        future.result()
+    _close_thread_browser()
+
+
+def _follow_redirects(url: str, timeout: float) -> str:
+    """Final URL after redirects; raises if it can't be resolved."""
+    # Impersonate a recent Chrome version. Others like 'chrome110', 'firefox117' are possible.
+    # Use allow_redirects=True (default)
+    response = curl_requests.get(url, impersonate="chrome116", timeout=timeout, allow_redirects=True)
+    response.raise_for_status()
+    final_url = response.url
+
+    if any(t in final_url for t in TRACKERS):
+        final_url = _follow_redirects_with_playwright(url, timeout=timeout)
+        logger.info("Resolved via Playwright: %s → %s", url, final_url)
+        return final_url
+
+    logger.info("Resolved via curl_cffi: %s → %s", url, final_url)
+    return final_url
+
+
+def _follow_redirects_with_playwright(url: str, timeout: float) -> str:
+    context = init_playwright_browser()
+    page = context.new_page()
+    try:
+        page.goto(url, timeout=timeout * 1000)
+        return page.url
+    finally:
+        page.close()
 
 
 def resolve_redirect_impersonate(url: str, timeout: float = 15.0) -> str:
     if not url or not (url.startswith('http://') or url.startswith('https://')):
-        logger.warning(f"Invalid URL scheme: '{url}'.")
+        logger.warning("Invalid URL scheme: '%s'.", url)
         return url
     try:
-        # Impersonate a recent Chrome version. Others like 'chrome110', 'firefox117' are possible.
-        # Use allow_redirects=True (default)
-        response = curl_requests.get(url, impersonate="chrome116", timeout=timeout, allow_redirects=True)
-        response.raise_for_status()
-        final_url = response.url
-
-        if any(t in final_url for t in TRACKERS):
-            final_url = resolve_redirect_with_playwright(url, timeout=timeout)
-            logger.info(f"Resolved via Playwright: {url} → {final_url}")
-            return final_url
-
-        logger.info(f"Resolved via curl_cffi: {url} → {final_url}")
-        return final_url
-
+        return _follow_redirects(url, timeout=timeout)
     except Exception as e:
-        logger.warning(f"curl_cffi failed for {url}: {e}")
-
-    return url
+        logger.warning("Could not resolve redirect for %s: %s", url, e)
+        return url
 
 
 def resolve_redirect_with_playwright(url: str, timeout: float = 15.0) -> str:
     try:
-        init_playwright_browser()
-        page = context.new_page()
-        page.goto(url, timeout=timeout * 1000)
-        final_url = page.url
-        page.close()
-        return final_url
+        return _follow_redirects_with_playwright(url, timeout=timeout)
     except Exception as e:
-        logger.warning(f"Playwright failed for {url}: {e}")
+        logger.warning("Playwright failed for %s: %s", url, e)
         return url
 
 
@@ -87,27 +140,35 @@ def strip_tracking_params(url: str, allowed_params=None) -> str:
     return urlunparse(parsed._replace(query=new_query))
 
 
+@functools.lru_cache(maxsize=RESOLVED_LINK_CACHE_SIZE)
+def _resolve_link_cached(url: str) -> str:
+    # Failures raise rather than return `url`, so lru_cache only keeps successful lookups
+    if any(tracker_domain in url for tracker_domain in TRACKERS):
+        url = _follow_redirects(url, timeout=10.0)
+    return strip_tracking_params(url)
+
+
+def _resolve_link(url: str) -> str:
+    try:
+        return _resolve_link_cached(url)
+    except Exception as e:
+        logger.warning("⚠️ Could not resolve: %s — %s", url, e)
+        return url
+
+
 def resolve_links_in_body(body: str) -> str:
     """
     Finds and resolves Beehiiv-style or standalone https URLs in text,
     removing tracking parameters if present.
     """
-    pattern = re.compile(r"<(https://[^>\s]+)>|(?<!href=\")\b(https://[^\s<>\"']+)\b")
-    found_links = set(match.group(1) or match.group(2) for match in pattern.finditer(body))
-
-    replacements = {}
-    for url in found_links:
-        try:
-            resolved = resolve_redirect_from_known_sources(url)
-            stripped = strip_tracking_params(resolved)
-            replacements[url] = stripped
-        except Exception as e:
-            print(f"[warn] Could not resolve: {url} — {e}")
-            replacements[url] = url
+    found_links = list(dict.fromkeys(match.group(1) or match.group(2) for match in _LINK_RE.finditer(body)))
+
+    # Redirect lookups are network-bound, so they run side by side
+    replacements = dict(zip(found_links, _link_pool.map(_resolve_link, found_links)))
 
     def replacer(match):
         original = match.group(1) or match.group(2)
         resolved = replacements.get(original, original)
         return f"<{resolved}>" if match.group(1) else resolved
 
-    return pattern.sub(replacer, body)
+    return _LINK_RE.sub(replacer, body)
@@ -1,21 +1,35 @@
 import functools
 import hashlib
-import json
 import logging
+import time
+import typing as ta
 from pathlib import Path
 import inspect
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 CACHE_BASE_DIR = Path(".cache/app_cache") # General base cache directory
 
-def disk_cache(cache_subdirectory_name: str):
+def disk_cache(
+        cache_subdirectory_name: str,
+        ttl_days: float | None = None,
+        key_args: ta.Sequence[str] | None = None,
+        skip_if: ta.Callable[[dict], bool] | None = None,
+):
     """
     General-purpose decorator to cache function results to disk.
+    Works for both regular and `async def` functions.
 
     Args:
         cache_subdirectory_name: Name of the subdirectory within CACHE_BASE_DIR
                                  to store cache files for the decorated function.
+        ttl_days: If set, cache files older than this many days are treated as a miss.
+        key_args: If set, only these argument names contribute to the cache key
+                  (e.g. to ignore transport-only args like `timeout`).
+        skip_if: Optional predicate over the bound arguments; when it returns True the
+                 call bypasses the cache entirely (e.g. for non-deterministic calls).
     """
     def decorator(func):
         cache_dir = CACHE_BASE_DIR / cache_subdirectory_name
@@ -23,66 +37,107 @@ def disk_cache(cache_subdirectory_name: str):
             cache_dir.mkdir(parents=True, exist_ok=True)
         except OSError as e:
             # This might happen in rare concurrent scenarios or due to permissions
-            logger.error(f"Error creating cache directory {cache_dir}: {e}. Caching may fail.")
+            logger.error("Error creating cache directory %s: %s. Caching may fail.", cache_dir, e)
 
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
+        _MISS = object()
+        # Resolved once per decorated function rather than on every call
+        sig = inspect.signature(func)
+
+        def _cache_file_for(args, kwargs) -> Path | None:
+            """Resolve the cache file for a call, or None if the call should bypass the cache."""
             # Create a stable cache key from args and kwargs
             # Bind arguments to their names for stable key generation
-            sig = inspect.signature(func)
             bound_args = sig.bind(*args, **kwargs)
             bound_args.apply_defaults()
-            
+
+            if skip_if is not None and skip_if(bound_args.arguments):
+                return None
+
             # Create a dictionary of arguments, ensuring consistent order for hashing
             # by sorting keys.
             key_dict = dict(sorted(bound_args.arguments.items()))
+            if key_args is not None:
+                key_dict = {k: v for k, v in key_dict.items() if k in key_args}
 
             try:
-                # Serialize the sorted dictionary of arguments to a JSON string.
-                # Using default=str to handle simple non-serializable types like datetime, Path etc.
+                # Serialize the sorted dictionary of arguments to JSON bytes.
+                # Using default=str to handle simple non-serializable types like Path etc.
                 # For more complex objects, a custom default handler might be needed.
-                cache_key_input = json.dumps(key_dict, sort_keys=True, default=str)
+                cache_key_input = orjson.dumps(
+                    key_dict, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str
+                )
             except TypeError as e:
                 logger.error(
-                    f"Cache key generation failed for {func.__name__} due to non-serializable arguments: {e}. "
-                    f"Caching will be skipped for this call."
+                    "Cache key generation failed for %s due to non-serializable arguments: %s. "
+                    "Caching will be skipped for this call.", func.__name__, e
                 )
-                return func(*args, **kwargs) # Execute the function without caching
+                return None # Execute the function without caching
 
-            cache_key = hashlib.md5(cache_key_input.encode('utf-8')).hexdigest()
-            cache_file = cache_dir / f"{cache_key}.json"
+            cache_key = hashlib.sha256(cache_key_input).hexdigest()
+            return cache_dir / f"{cache_key}.json"
 
-            # Try to read from cache
-            if cache_file.exists():
+        def _read(cache_file: Path):
+            cache_key = cache_file.stem
+            # Try to read from cache (expired entries count as a miss)
+            if cache_file.exists() and ttl_days is not None and \
+                    time.time() - cache_file.stat().st_mtime > ttl_days * 86_400:
+                logger.info("⌛ Cache EXPIRED for %s in '%s'. Key: %s", func.__name__, cache_subdirectory_name, cache_key)
+            elif cache_file.exists():
                 try:
-                    with open(cache_file, 'r', encoding='utf-8') as f:
-                        cached_data = json.load(f)
-                    logger.info(f"💾 Cache HIT for {func.__name__} in '{cache_subdirectory_name}'. Key: {cache_key}")
+                    with open(cache_file, 'rb') as f:
+                        cached_data = orjson.loads(f.read())
+                    logger.info("💾 Cache HIT for %s in '%s'. Key: %s", func.__name__, cache_subdirectory_name, cache_key)
                     return cached_data
-                except (IOError, json.JSONDecodeError, TypeError) as e: # Added TypeError for safety
+                except (IOError, orjson.JSONDecodeError, TypeError) as e: # Added TypeError for safety
                     logger.warning(
-                        f"⚠️ Error reading cache file {cache_file} for {func.__name__}: {e}. "
-                        f"Cache will be re-populated."
+                        "⚠️ Error reading cache file %s for %s: %s. "
+                        "Cache will be re-populated.", cache_file, func.__name__, e
                     )
             else:
-                logger.info(f"💨 Cache MISS for {func.__name__} in '{cache_subdirectory_name}'. Key: {cache_key}")
-
-            # Execute the function if cache miss or error
-            result = func(*args, **kwargs)
+                logger.info("💨 Cache MISS for %s in '%s'. Key: %s", func.__name__, cache_subdirectory_name, cache_key)
+            return _MISS
 
+        def _write(cache_file: Path, result) -> None:
             # Write to cache
             # Only attempt to cache if the result is not None.
             # You might want to change this if caching None is desirable.
             if result is not None:
                 try:
-                    with open(cache_file, 'w', encoding='utf-8') as f:
-                        json.dump(result, f, indent=2) # Using indent for readability of cache files
-                    logger.info(f"💾 Cache WRITE for {func.__name__} in '{cache_subdirectory_name}'. Key: {cache_key}")
+                    with open(cache_file, 'wb') as f:
+                        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2)) # Using indent for readability of cache files
+                    logger.info("💾 Cache WRITE for %s in '%s'. Key: %s", func.__name__, cache_subdirectory_name, cache_file.stem)
                 except (IOError, TypeError) as e: # TypeError if result is not JSON serializable
                     logger.warning(
-                        f"⚠️ Error writing cache file {cache_file} for {func.__name__}: {e}. "
-                        f"Result not cached."
+                        "⚠️ Error writing cache file %s for %s: %s. "
+                        "Result not cached.", cache_file, func.__name__, e
                     )
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_file = _cache_file_for(args, kwargs)
+                if cache_file is None:
+                    return await func(*args, **kwargs)
+                cached_data = _read(cache_file)
+                if cached_data is not _MISS:
+                    return cached_data
+                result = await func(*args, **kwargs)
+                _write(cache_file, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_file = _cache_file_for(args, kwargs)
+            if cache_file is None:
+                return func(*args, **kwargs)
+            cached_data = _read(cache_file)
+            if cached_data is not _MISS:
+                return cached_data
+
+            # Execute the function if cache miss or error
+            result = func(*args, **kwargs)
+            _write(cache_file, result)
             return result
         return wrapper
     return decorator 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import hashlib
+import inspect
 import math
 import logging
 import typing as ta
@@ -27,18 +28,31 @@ def round_sig(x, sig=1):
     return round(x, -int(math.floor(math.log10(abs(x)))) + (sig - 1))
 
 
+# Events at the same venue repeat the same postcode, and a DataFrame row lookup is
+# far slower than a dict hit
+POSTCODE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=POSTCODE_CACHE_SIZE)
+def _postcode_row(clean: str) -> ta.Optional[ta.Dict[str, ta.Any]]:
+    df = _load_postcode_data()
+    if clean in df.index:
+        row = df.loc[clean]
+        return {
+            "lat": row["lat"],
+            "lon": row["lon"],
+            "borough": row["borough"],
+            "neighbourhood": row["neighbourhood"],
+        }
+    return None
+
+
 def get_postcode_info(postcode: str):
     if isinstance(postcode, str):
-        df = _load_postcode_data()
-        clean = postcode.replace(" ", "").upper()
-        if clean in df.index:
-            row = df.loc[clean]
-            return {
-                "lat": row["lat"],
-                "lon": row["lon"],
-                "borough": row["borough"],
-                "neighbourhood": row["neighbourhood"],
-            }
+        # "e1 6an", "E1  6AN" and "E16AN" share one cache entry
+        row = _postcode_row("".join(postcode.split()).upper())
+        if row is not None:
+            return dict(row)
     return {}
 
 
@@ -76,6 +90,24 @@ def is_valid_london_postcode(postcode: str) -> bool:
     return True
 
 
+# Full UK postcode (outward + inward code), e.g. "E1 6AN", "SW1A 1AA", "n166tx"
+_UK_POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2})\b', re.IGNORECASE)
+
+
+def find_london_postcode(text: str) -> ta.Optional[str]:
+    """
+    Returns the last postcode in `text` (addresses end with it) that resolves to a
+    known London postcode, normalised as "OUT IN", or None.
+    """
+    if not isinstance(text, str):
+        return None
+    for candidate in reversed(_UK_POSTCODE_RE.findall(text)):
+        clean = "".join(candidate.split()).upper()
+        if is_valid_london_postcode(clean):
+            return f"{clean[:-3]} {clean[-3:]}"
+    return None
+
+
 def geocode_postcode_to_latlon(postcode: str) -> ta.Tuple[float, float]:
     """
     Returns (latitude, longitude) for the given postcode.
@@ -157,7 +189,7 @@ def bearing_to_arrow(angle_degrees: float) -> str:
         return arrows[segment_index]
     except IndexError:
         # This should ideally not happen if angle_degrees is within 0-360
-        logger.warning(f"Could not map bearing {angle_degrees} to arrow index {segment_index}.")
+        logger.warning("Could not map bearing %s to arrow index %s.", angle_degrees, segment_index)
         return "·"  # Fallback character
 
 
@@ -194,6 +226,19 @@ def trim_aggregator_email_bodies_from_known_sources(
 
 def timed(label="Function"):
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    end = time.perf_counter()
+                    duration = end - start
+                    logging.info("%s took %.2f seconds", label, duration)
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             start = time.perf_counter()
@@ -202,7 +247,7 @@ def timed(label="Function"):
             finally:
                 end = time.perf_counter()
                 duration = end - start
-                logging.info(f"{label} took {duration:.2f} seconds")
+                logging.info("%s took %.2f seconds", label, duration)
 
         return wrapper
 
@@ -0,0 +1,14 @@
+-- Emails with no emails_processed row, filtered server-side so `batch` rows
+-- are always unprocessed ones (NULL batch = no limit).
+create or replace function get_unprocessed_emails(batch integer default null)
+returns setof emails
+language sql
+stable
+as $$
+    select e.*
+    from emails e
+    where not exists (
+        select 1 from emails_processed p where p.message_id = e.message_id
+    )
+    limit batch;
+$$;
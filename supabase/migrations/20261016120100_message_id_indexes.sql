@@ -0,0 +1,10 @@
+-- Keep the per-message existence probes index-only as the tables grow.
+-- emails.message_id (upsert on_conflict target) and emails_processed.message_id
+-- (upsert primary key) are already backed by unique indexes; events has none.
+-- Not CONCURRENTLY: migrations run inside a transaction.
+create index if not exists events_email_message_id_idx
+    on events (email_message_id);
+
+-- `emails.main()` reads the latest processed_at on every run.
+create index if not exists emails_processed_at_idx
+    on emails (processed_at desc);
@@ -0,0 +1,7 @@
+-- Gmail sync cursor: the mailbox historyId at the start of the last successful
+-- ingest, so the next run can ask `users.history.list` for only what changed.
+create table if not exists gmail_state (
+    account    text primary key,
+    history_id text not null,
+    updated_at timestamptz not null default now()
+);
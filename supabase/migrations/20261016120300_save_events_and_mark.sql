@@ -0,0 +1,52 @@
+-- Persist one email's events and its emails_processed row in a single round
+-- trip and a single transaction. Events are skipped if the email already has
+-- some, so retries after a partial failure can't duplicate them.
+create or replace function save_events_and_mark(
+    mid       text,
+    evs       jsonb,
+    parsed_ok boolean,
+    note      text default null
+)
+returns integer
+language plpgsql
+as $$
+declare
+    inserted integer := 0;
+begin
+    if not exists (select 1 from events where email_message_id = mid) then
+        insert into events (
+            email_message_id, title, summary, description_verbatim,
+            start_date, end_date, start_time, end_time, is_all_day, time_of_day, timezone,
+            occurrence_type, recurrence_rule,
+            location_type, location_address_verbatim, location_postcode,
+            location_neighbourhood, location_borough, online_url,
+            cost_amount, cost_currency, is_donation_based, is_cost_tbc, cost_description_verbatim,
+            booking_type, booking_url, event_url,
+            vibes_tags, target_audiences, event_types,
+            organizer_name, is_organizer_sender, from_aggregator, parsing_confidence_score
+        )
+        select
+            mid, title, summary, description_verbatim,
+            start_date, end_date, start_time, end_time, is_all_day, time_of_day, timezone,
+            occurrence_type, recurrence_rule,
+            location_type, location_address_verbatim, location_postcode,
+            location_neighbourhood, location_borough, online_url,
+            cost_amount, cost_currency, is_donation_based, is_cost_tbc, cost_description_verbatim,
+            booking_type, booking_url, event_url,
+            vibes_tags, target_audiences, event_types,
+            organizer_name, is_organizer_sender, from_aggregator, parsing_confidence_score
+        from jsonb_populate_recordset(null::events, evs)
+        on conflict do nothing;
+        get diagnostics inserted = row_count;
+    end if;
+
+    insert into emails_processed (message_id, processed_at, parsed_ok, note)
+    values (mid, now(), parsed_ok, note)
+    on conflict (message_id) do update
+        set processed_at = excluded.processed_at,
+            parsed_ok    = excluded.parsed_ok,
+            note         = excluded.note;
+
+    return inserted;
+end;
+$$;
@@ -0,0 +1,7 @@
+-- Newsletter classification results keyed by the SHA-256 of the whitespace-normalised
+-- email body, so a template re-sent verbatim is not sent to the LLM again.
+create table if not exists classification_cache (
+    body_hash     text primary key,
+    is_newsletter boolean not null,
+    created_at    timestamptz not null default now()
+);
@@ -0,0 +1,22 @@
+-- Page through unprocessed emails by message_id so callers can stream them.
+-- Keyset (not offset) paging: rows marked processed mid-scan don't shift
+-- later pages. NULL after_id starts from the beginning, NULL batch = no limit.
+drop function if exists get_unprocessed_emails(integer);
+
+create or replace function get_unprocessed_emails(
+    batch    integer default null,
+    after_id text    default null
+)
+returns setof emails
+language sql
+stable
+as $$
+    select e.*
+    from emails e
+    where (after_id is null or e.message_id > after_id)
+      and not exists (
+        select 1 from emails_processed p where p.message_id = e.message_id
+    )
+    order by e.message_id
+    limit batch;
+$$;
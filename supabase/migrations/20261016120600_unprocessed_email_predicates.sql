@@ -0,0 +1,54 @@
+-- Push the "too large" / "not a newsletter" skips into Postgres, so rows that
+-- would be discarded never cross the wire. `mark_skipped_emails` records them
+-- in emails_processed in one statement; `get_unprocessed_emails` can then
+-- filter them out of each page.
+drop function if exists get_unprocessed_emails(integer, text);
+
+create or replace function get_unprocessed_emails(
+    batch            integer default null,
+    after_id         text    default null,
+    max_body_chars   integer default null,
+    newsletters_only boolean default false
+)
+returns setof emails
+language sql
+stable
+as $$
+    select e.*
+    from emails e
+    where (after_id is null or e.message_id > after_id)
+      and (max_body_chars is null or length(coalesce(e.body, '')) <= max_body_chars)
+      and (not newsletters_only or e.is_newsletter is true)
+      and not exists (
+        select 1 from emails_processed p where p.message_id = e.message_id
+    )
+    order by e.message_id
+    limit batch;
+$$;
+
+create or replace function mark_skipped_emails(
+    max_body_chars integer
+)
+returns integer
+language sql
+as $$
+    with skipped as (
+        insert into emails_processed (message_id, processed_at, parsed_ok, note)
+        select
+            e.message_id,
+            now(),
+            false,
+            case
+                when length(coalesce(e.body, '')) > max_body_chars then 'body_too_large'
+                else 'not_newsletter'
+            end
+        from emails e
+        where (length(coalesce(e.body, '')) > max_body_chars or e.is_newsletter is not true)
+          and not exists (
+            select 1 from emails_processed p where p.message_id = e.message_id
+        )
+        on conflict (message_id) do nothing
+        returning 1
+    )
+    select count(*)::integer from skipped;
+$$;